@@ -52,6 +52,7 @@ def stopAt(e:Number=0, rel_e:Number=2**(-32), max_iter:Number=1000) -> StopCondi
         if abs(iter_after-iter_before) < rel_e*abs(iter_before): return True
         if iter_times >= max_iter: return True
         return False
+    stop.e, stop.rel_e, stop.max_iter = e, rel_e, max_iter     #供需要容许误差本身的方法使用，比如 nle_dichotomy.Brent
     return stop
 
 def astopAt(e:Number=0, rel_e:Number=2**(-32), max_iter:Number=1000) -> StopCondition:
@@ -62,4 +63,22 @@ def astopAt(e:Number=0, rel_e:Number=2**(-32), max_iter:Number=1000) -> StopCond
         if (np.abs(iter_after-iter_before) < np.abs(rel_e*iter_before)).all(): return True
         if iter_times >= max_iter: return True
         return False
+    stop.e, stop.rel_e, stop.max_iter = e, rel_e, max_iter
+    return stop
+
+def vstopAt(e:Number=0, rel_e:Number=2**(-32), max_iter:Number=1000) -> StopCondition:
+    '''通过输入一系列条件，直接得到对 array 逐元素的迭代停止判断方法
+    与 stopAt 的判断条件相同，但不合并为一个结果，而是返回与输入形状相同的 bool array，
+    用于同时求解多个互相独立的问题，每个元素各自判断是否应该停止迭代
+    stop.converged(iter_before, iter_after) 只按误差限判断，不考虑迭代次数，
+    用于区分停止的元素是已经收敛，还是达到了最大迭代次数'''
+    def converged(iter_before:np.ndarray, iter_after:np.ndarray) -> np.ndarray:
+        step = np.abs(iter_after-iter_before)
+        return (step < e) | (step < rel_e*np.abs(iter_before))
+    def stop(iter_before:np.ndarray, iter_after:np.ndarray, iter_times:Number):
+        if iter_times == 0: return np.zeros(np.shape(iter_before), dtype=bool)
+        if iter_times >= max_iter: return np.ones(np.shape(iter_before), dtype=bool)
+        return converged(iter_before, iter_after)
+    stop.converged = converged
+    stop.e, stop.rel_e, stop.max_iter = e, rel_e, max_iter
     return stop
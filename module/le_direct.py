@@ -127,13 +127,35 @@ def Gauss(a:np.ndarray, b:np.ndarray) -> np.ndarray:
             _a[j,:] -= _a[i,:]*(_a[j,i])
     return _b
 
+def Gauss_batch(a:np.ndarray, b:np.ndarray) -> np.ndarray:
+    '''批量的部分主元消去法，同时解 m 个互相独立的 n 阶方程组 a[i]*x[i] = b[i]
+    a 的形状为 (m,n,n)，b 的形状为 (m,n) 或 (m,n,k)，返回与 b 形状相同的 x
+    每次消元对 m 个方程组同时进行，只有 n 次 python 循环
+    出现主元为零的方程组不会报错，其解为 nan 或 inf，不影响其他方程组'''
+    _a = a.astype(float)
+    _b = b.astype(float).reshape(b.shape[:2]+(-1,))
+    m, n = _a.shape[:2]
+    index = np.arange(m)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(n):
+            row = i + np.argmax(np.abs(_a[:,i:,i]), axis=1) #找到各方程组绝对值最大元素所在行
+            _a[index,i], _a[index,row] = _a[index,row], _a[index,i].copy()   #进行对调
+            _b[index,i], _b[index,row] = _b[index,row], _b[index,i].copy()
+            temp = _a[:,i+1:,i]/_a[:,i,i,None]
+            _a[:,i+1:,i:] -= temp[:,:,None]*_a[:,None,i,i:]
+            _b[:,i+1:] -= temp[:,:,None]*_b[:,None,i]
+        for i in range(n-1, -1, -1):  #回代
+            _b[:,i] -= np.einsum("mj,mjk->mk", _a[:,i,i+1:], _b[:,i+1:])
+            _b[:,i] /= _a[:,i,i,None]
+    return _b.reshape(b.shape)
+
 type ARRANGE = list[int]
 
 def lu(a:np.ndarray) -> tuple[LU, ARRANGE]:
     '''LU分解法，p*a = l*u
     注意到有效的内容都在 l 的下三角区域（不含对角线）和 u 的上三角区域（含对角线）。
     所以两者可以储存在同一个矩阵中。从而节省一半内存。'''
-    lu = a.copy()
+    lu = a.astype(float)
     arrange = [i for i in range(a.shape[0])]
     n = a.shape[0]
     for i in range(n):            #行变换形成上三角矩阵
@@ -144,28 +166,23 @@ def lu(a:np.ndarray) -> tuple[LU, ARRANGE]:
             print("出错，计算过程中出现主元为零：")
             print(lu)
             raise ValueError("主元为零")
-        for j in range(i+1, n):
-            lu[j,i] /= -lu[i,i]
-            lu[j,:i] += lu[i,:i]*lu[j,i]
-            lu[j,i+1:] -= lu[i,i+1:]*lu[j,i]
+        lu[i+1:,i] /= lu[i,i]       #下三角区域储存 l 的元素，整行对调时随之对调
+        lu[i+1:,i+1:] -= np.outer(lu[i+1:,i], lu[i,i+1:])
     return lu, arrange
 
 def lu_memorysave_SubstitudeBack(lu:tuple[LU, ARRANGE],b:np.ndarray):
     '''LU分解法回代，l*u*x=p*b
-    对应节省内存的lu分解法'''
-    n = lu[0].shape[0]
-    arrangerow(b, lu[1])
-    c = np.zeros(n, dtype=float)
-    for i in range(n):
-        for j in range(i):
-            b[i,0] -= c[j]*lu[0][i,j]
-        c[i]=b[i,0]
-    x = np.ndarray(np.zeros((1,n), dtype=float))
-    for i in range(n-1, -1, -1):
-        for j in range(n-1, i, -1):
-            c[i]-=lu[0][i,j]*x[j,0]
-        x[i,0]=c[i]/lu[0][i,i]
-    return x
+    对应节省内存的lu分解法
+    b 可以有多列，不会修改 b。只需 o(n^2) 次运算，同一个分解可以反复用于不同的 b'''
+    lu, arrange = lu
+    n = lu.shape[0]
+    c = b.astype(float).reshape((n,-1))
+    arrangerow(c, arrange)
+    for i in range(n):            #l*c = p*b
+        c[i,:] -= np.matmul(lu[i,:i], c[:i,:])
+    for i in range(n-1, -1, -1):  #u*x = c
+        c[i,:] = (c[i,:] - np.matmul(lu[i,i+1:], c[i+1:,:]))/lu[i,i]
+    return c.reshape(b.shape)
 
 def GaussJordan(a:np.ndarray) -> np.ndarray:
     '''求逆矩阵 a*r = i, 给出 r
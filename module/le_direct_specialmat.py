@@ -4,6 +4,7 @@
 '''解特殊线性方程组的直接法'''
 
 from numbers import Number
+import numpy as np
 
 #三对角矩阵
 # b_0 c_0
@@ -34,6 +35,48 @@ def d3_SubstitudeBack(d3, b:list[Number]) -> list[Number]:
         x[i] -= bet[i]*x[i+1]
     return x
 
+#带状矩阵：下带宽为 l，上带宽为 u，即 i-j > l 或 j-i > u 时 a[i,j] = 0
+#以形状为 (n, l+u+1) 的 array 按行存储：ab[i, j-i+l] = a[i,j]，超出矩阵的位置不使用
+#三对角矩阵即 l = u = 1 的情形
+type Band = tuple[np.ndarray, int, int]
+
+def band(a:np.ndarray, l:int, u:int) -> np.ndarray:
+    '''从普通的 (n, n) 矩阵中取出带状部分，按上述方式存储'''
+    n = a.shape[0]
+    ab = np.zeros((n, l+u+1))
+    for k in range(-l, u+1):
+        diagonal = np.diagonal(a, k)
+        if k >= 0: ab[:n-k, k+l] = diagonal
+        else: ab[-k:, k+l] = diagonal
+    return ab
+
+def band_lu(ab:np.ndarray, l:int, u:int) -> Band:
+    '''带状矩阵的 LU 分解，不选主元，因此 l, u 的带宽保持不变，只需 o(n*l*u) 次运算
+    要求各顺序主子式非零（比如对角占优），l 存放在对角线左侧，u 存放在对角线及右侧'''
+    lu = ab.astype(float)
+    n = lu.shape[0]
+    for k in range(n):
+        if lu[k,l] == 0:
+            raise ValueError("主元为零")
+        w = min(u, n-1-k)
+        for m in range(1, min(l, n-1-k)+1):
+            lu[k+m,l-m] /= lu[k,l]
+            lu[k+m,l-m+1:l-m+1+w] -= lu[k+m,l-m]*lu[k,l+1:l+1+w]
+    return lu, l, u
+
+def band_SubstitudeBack(lu:Band, b:np.ndarray) -> np.ndarray:
+    '''带状矩阵的 LU 分解回代，不会修改 b，只需 o(n*(l+u)) 次运算'''
+    lu, l, u = lu
+    n = lu.shape[0]
+    x = np.array(b, dtype=float).reshape(n)
+    for i in range(n):
+        low = max(0, i-l)
+        x[i] -= lu[i,low-i+l:l] @ x[low:i]
+    for i in range(n-1, -1, -1):
+        high = min(n-1, i+u)
+        x[i] = (x[i] - lu[i,l+1:l+1+high-i] @ x[i+1:high+1])/lu[i,l]
+    return x.reshape(np.shape(b))
+
 if __name__ == "__main__":
     import numpy as np
     l,d,u = d3([[1,2,3],[4,5,6,7],[1,2,3]])
@@ -6,6 +6,7 @@
 
 import numpy as np
 from numbers import Number
+from typing import Callable
 
 try:
     from ._matfunc import *
@@ -99,3 +100,117 @@ def successive_relaxation(
             x0[i,0] = d[i]*(_a[i,:]*x0[:,0]).sum()
         x0[:] = x + alpha*(x0 - x)
     return x0
+
+def Chebyshev(
+    a:np.ndarray, b:np.ndarray, 
+    x0:np.ndarray = None,
+    stop:StopCondition = astopAt(),
+    rho:Number = None) -> np.ndarray:
+    '''切比雪夫半迭代法（以雅可比迭代法为基础）
+    记雅可比迭代为 x = t*x + c，若 t 的特征值都是实数，且落在 [-rho, rho] 中，
+    则用切比雪夫多项式把前两步的结果组合起来：
+     y[k+1] = w[k+1]*(t*y[k] + c - y[k-1]) + y[k-1]
+     w[1] = 1, w[2] = 2/(2-rho**2), w[k+1] = 1/(1-rho**2*w[k]/4)
+    误差按 rho/(1+sqrt(1-rho**2)) 而非 rho 的速度衰减，每步计算量与雅可比迭代法相同。
+    
+    比如 a 对称且对角元为正时，t 相似于对称矩阵，特征值为实数。
+    rho 为 t 的谱半径，如果 rho 为 None，则用幂法估计。估计偏小时方法可能不收敛。'''
+    _a = a.copy()
+    n = _a.shape[0]
+    if x0 is None: x0 = b.copy()
+
+    d = []  #分离 d 和 l+u
+    for i in range(n):
+        d.append(1/_a[i,i])
+        _a[i,i] = 0
+    
+    if rho is None:         #幂法估计 t = -d*(l+u) 的谱半径，用两步之比以兼顾 ±rho
+        v = np.ones((n,1))
+        for i in range(50):
+            v = mul_perrow(np.matmul(_a, v), d)
+            v /= np.abs(v).max()
+        rho = np.sqrt(np.abs(mul_perrow(np.matmul(_a, mul_perrow(np.matmul(_a, v), d)), d)).max())
+    rho2 = rho**2
+
+    time = 0; w = 1
+    x = np.zeros((n,1))
+    while not stop(x, x0, time):
+        if time == 0: w = 1
+        elif time == 1: w = 2/(2-rho2)
+        else: w = 1/(1-rho2*w/4)
+        x, x0 = x0, w*(mul_perrow(b-np.matmul(_a, x0), d) - x) + x
+        time += 1
+    return x0
+
+def GMRES(
+    a:np.ndarray|Callable[[np.ndarray],np.ndarray], b:np.ndarray,
+    x0:np.ndarray = None,
+    rtol:Number = 1e-8,
+    restart:int = 20,
+    max_iter:int = 1000) -> np.ndarray:
+    '''广义极小残差法 GMRES(m)
+    在 Krylov 子空间 span(r, a*r, a*a*r, ...) 中求使残差 |b - a*x| 最小的 x。
+    用 Arnoldi 过程（修正的 Gram-Schmidt 正交化）得到子空间的正交基 v 与上 Hessenberg 矩阵 hm，
+    再用 Givens 旋转逐列化为上三角，同时得到当前残差，无需每步求解最小二乘问题。
+
+    a 可以是矩阵，也可以是计算 a*v 的函数（无需显式给出矩阵，比如 Jacobian-free 方法）。
+    当残差小于 rtol*|b| 时停止；子空间维数达到 restart 时以当前结果重新开始，
+    所以只需 O(n*restart) 的内存。max_iter 为总的矩阵乘法次数上限。
+    子空间不再扩大时也停止；若此时 a 在子空间上奇异（比如 a 奇异而 b 不在其值域中），
+    无法再减小残差，返回当前的 x，其残差不一定小于 rtol*|b|。'''
+    matvec = a if callable(a) else (lambda v: np.matmul(a, v))
+    shape = b.shape
+    b = b.reshape(-1)
+    n = b.size; m = restart
+    x = np.zeros(n) if x0 is None else x0.reshape(-1).astype(float)
+    bnorm = np.linalg.norm(b)
+    if bnorm == 0: return np.zeros(shape)
+    v = np.zeros((m+1, n))
+    hm = np.zeros((m+1, m))
+    cs, sn = np.zeros(m), np.zeros(m)
+    time = 0
+    while time < max_iter:
+        r = b - matvec(x.reshape(shape)).reshape(-1)
+        beta = np.linalg.norm(r)
+        if beta <= rtol*bnorm: break
+        v[0] = r/beta
+        g = np.zeros(m+1); g[0] = beta
+        for j in range(m):
+            w = matvec(v[j].reshape(shape)).reshape(-1)
+            time += 1
+            for i in range(j+1):                    #修正的 Gram-Schmidt 正交化
+                hm[i,j] = np.dot(w, v[i])
+                w -= hm[i,j]*v[i]
+            hm[j+1,j] = np.linalg.norm(w)
+            breakdown = hm[j+1,j] == 0              #子空间不再扩大；下面的 rho 不为零时，最小二乘解就是精确解
+            if not breakdown: v[j+1] = w/hm[j+1,j]
+            for i in range(j):                      #之前的 Givens 旋转
+                hm[i,j], hm[i+1,j] = cs[i]*hm[i,j] + sn[i]*hm[i+1,j], -sn[i]*hm[i,j] + cs[i]*hm[i+1,j]
+            rho = np.hypot(hm[j,j], hm[j+1,j])
+            if rho == 0:                            #a 在子空间上奇异，无法继续：只用前 j 列更新 x 后停止
+                k = j
+                break
+            cs[j], sn[j] = hm[j,j]/rho, hm[j+1,j]/rho
+            hm[j,j], hm[j+1,j] = rho, 0
+            g[j], g[j+1] = cs[j]*g[j], -sn[j]*g[j]
+            k = j+1
+            if abs(g[k]) <= rtol*bnorm or breakdown or time >= max_iter: break
+        y = np.zeros(k)                             #回代求上三角方程组
+        for i in range(k-1, -1, -1):
+            y[i] = (g[i] - np.dot(hm[i,i+1:k], y[i+1:]))/hm[i,i]
+        x += np.matmul(y, v[:k])
+        if abs(g[k]) <= rtol*bnorm or breakdown: break
+    return x.reshape(shape)
+
+if __name__ == "__main__":
+    #雅可比迭代与切比雪夫半迭代的迭代次数对比，二者每步都是一次矩阵乘法
+    n = 100
+    a = 4*np.eye(n) - np.eye(n, k=1) - np.eye(n, k=-1) - np.eye(n, k=10) - np.eye(n, k=-10)
+    b = np.ones((n,1))
+    class counter:
+        def __init__(self, stop): self.stop = stop; self.times = 0
+        def __call__(self, *args): self.times += 1; return self.stop(*args)
+    for method in (Jacobi, Chebyshev):
+        stop = counter(astopAt(e=1e-12))
+        x = method(a, b, stop=stop)
+        print(f"{method.__name__}: 残差 {np.abs(np.matmul(a, x) - b).max()}, 迭代次数：{stop.times-1}")
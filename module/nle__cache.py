@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+'''为计算代价高的函数提供有界的求值缓存
+
+nle_iter 与 nle_dichotomy 中的各方法只通过调用 f (以及 df) 来使用函数，
+所以把 EvalCache(f) 代替 f 传入即可，无需修改方法本身。
+比如 Newton_derivative 的默认数值导数会在 x, x+h, x-h 处反复计算 f。
+这些方法也都有 cache 参数（见 use_cache），由方法自己包装 f；
+批量版本（*_batch）与 Aberth 每次以新的 array 调用 f，不会重复，没有 cache 参数。'''
+
+from collections import OrderedDict
+from numbers import Number
+from typing import Callable
+import numpy as np
+
+try: from .ode__typing import X, Y
+except: from ode__typing import X, Y
+
+class EvalCache:
+    '''最近最少使用 (LRU) 的求值缓存，最多保存 maxsize 个结果（None 表示不限）。
+
+    默认以自变量的精确值为键；给出 tol 时，自变量先按 tol 取整再作为键，
+    从而 (x+h)-h 与 x 这类只差舍入误差的自变量可以共用一个结果。
+    自变量可以是实数、复数或 np.ndarray；无法作为键的自变量直接计算，不进入缓存。
+
+    hits, misses 分别为命中、未命中的次数，evaluations 为实际计算 f 的总次数。
+    缓存中的 np.ndarray 结果会被原样返回，调用方不应原地修改。'''
+
+    def __init__(self, f:Callable[[X],Y], maxsize:int = 128, tol:Number = None):
+        self.f = f
+        self.maxsize = maxsize
+        self.tol = tol
+        self.table:OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evaluations = 0
+
+    def key(self, x):
+        if isinstance(x, np.ndarray):
+            if self.tol is not None: x = np.round(x/self.tol)
+            return (x.shape, x.dtype.str, x.tobytes())
+        if self.tol is None:
+            return x
+        if isinstance(x, complex):
+            return (round(x.real/self.tol), round(x.imag/self.tol))
+        return round(x/self.tol)
+
+    def __call__(self, x):
+        try:
+            key = self.key(x)
+            hash(key)
+        except TypeError:
+            self.misses += 1
+            self.evaluations += 1
+            return self.f(x)
+        if key in self.table:
+            self.hits += 1
+            self.table.move_to_end(key)
+            return self.table[key]
+        self.misses += 1
+        self.evaluations += 1
+        self.table[key] = value = self.f(x)
+        if self.maxsize is not None and len(self.table) > self.maxsize:
+            self.table.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        '''清空缓存与计数'''
+        self.table.clear()
+        self.hits = self.misses = self.evaluations = 0
+
+    def __repr__(self):
+        return (f"EvalCache({getattr(self.f, '__name__', self.f)}, "
+                f"hits={self.hits}, misses={self.misses}, evaluations={self.evaluations})")
+
+def cached(maxsize:int = 128, tol:Number = None) -> Callable[[Callable[[X],Y]], EvalCache]:
+    '''装饰器形式的 EvalCache'''
+    return lambda f: EvalCache(f, maxsize, tol)
+
+def use_cache(f:Callable[[X],Y], cache:bool|int|Callable = None) -> Callable[[X],Y]:
+    '''各方法的 cache 参数：None 或 False 时原样返回 f；True 时包装为默认大小的 EvalCache；
+    为整数时包装为 maxsize = cache 的 EvalCache；也可以是 cached(maxsize, tol)，用它包装 f。
+    需要查看命中次数等计数时，应自己用 EvalCache 包装 f 再传入'''
+    if f is None or cache is None or cache is False: return f
+    if cache is True: return EvalCache(f)
+    if isinstance(cache, int): return EvalCache(f, cache)
+    return cache(f)
+
+if __name__ == "__main__":
+    try: from .nle_iter import Newton_derivative
+    except: from nle_iter import Newton_derivative
+
+    import math
+    calls = 0
+    def f(x):                           #使用 math.exp，不能接受对偶数，Newton_derivative 只能使用数值导数
+        global calls
+        calls += 1
+        return (x-1)**2*(x+2)*math.exp(-x)
+
+    for tol in (None, 1e-9):
+        calls = 0
+        cf = EvalCache(f, tol=tol)
+        x = Newton_derivative(cf, x0=3.0)
+        print(f"tol={tol}: x = {x}, {cf}, f 实际调用次数：{calls}")
+    calls = 0
+    x = Newton_derivative(f, x0=3.0)
+    print(f"不使用缓存: x = {x}, f 实际调用次数：{calls}")
+    calls = 0
+    x = Newton_derivative(f, x0=3.0, cache=cached(tol=1e-9))
+    print(f"cache=cached(tol=1e-9): x = {x}, f 实际调用次数：{calls}")
@@ -0,0 +1,204 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+'''前向模式自动微分所用的对偶数
+
+对偶数 a + b*eps 满足 eps**2 = 0，于是 f(a + b*eps) = f(a) + f'(a)*b*eps，
+只需调用一次 f 即可同时得到函数值与 (方向) 导数，且导数没有截断误差。
+
+这里的 Dual 可以包含 np.ndarray：val 为数值部分，der 为导数部分，
+der 比 val 多最后一维，长度 k 为同时求导的方向个数。
+ k = 1 时，一次调用得到雅可比矩阵与一个向量的乘积 (jvp)；
+ k = n 时，一次调用得到整个雅可比矩阵。
+
+f 只要由四则运算、乘方以及 numpy 的常用函数 (np.sin, np.exp 等) 组成，就可以接受 Dual。
+math 模块的函数无法接受 Dual，此时 accepts_dual 返回 None，调用方应当改用数值导数。
+np.stack 等不是 ufunc 的函数也不能接受 Dual，但报错不一定是 TypeError，这时请直接给出导数 df。'''
+
+from typing import Callable
+import numpy as np
+
+try: from .ode__typing import X, Y
+except: from ode__typing import X, Y
+
+def _value(a): return a.val if isinstance(a, Dual) else a
+
+def _expand(a): return np.expand_dims(np.asarray(a), -1)
+
+def _make(val, der) -> "Dual":
+    '''按 val 的形状广播 der，使常数与对偶数运算后导数部分的形状仍然正确'''
+    return Dual(val, np.broadcast_to(der, np.shape(val)+np.shape(der)[-1:]))
+
+#一元函数的导数，以数值部分为自变量
+_derivatives:dict[np.ufunc, Callable] = {
+    np.sin:     np.cos,
+    np.cos:     lambda a: -np.sin(a),
+    np.tan:     lambda a: 1/np.cos(a)**2,
+    np.arcsin:  lambda a: 1/np.sqrt(1-a**2),
+    np.arccos:  lambda a: -1/np.sqrt(1-a**2),
+    np.arctan:  lambda a: 1/(1+a**2),
+    np.sinh:    np.cosh,
+    np.cosh:    np.sinh,
+    np.tanh:    lambda a: 1/np.cosh(a)**2,
+    np.exp:     np.exp,
+    np.exp2:    lambda a: np.exp2(a)*np.log(2),
+    np.expm1:   np.exp,
+    np.log:     lambda a: 1/a,
+    np.log2:    lambda a: 1/(a*np.log(2)),
+    np.log10:   lambda a: 1/(a*np.log(10)),
+    np.log1p:   lambda a: 1/(1+a),
+    np.sqrt:    lambda a: 0.5/np.sqrt(a),
+    np.cbrt:    lambda a: 1/(3*np.cbrt(a)**2),
+    np.square:  lambda a: 2*a,
+    np.reciprocal: lambda a: -1/a**2,
+    np.absolute: np.sign,
+    np.negative: lambda a: -np.ones_like(a),
+    np.positive: np.ones_like,
+}
+
+#二元运算，使用 Dual 的运算符。左侧不是 Dual 时（比如 np.ndarray * Dual）使用右侧的反射运算符
+_operators:dict[np.ufunc, tuple[str, str]] = {
+    np.add:         ("__add__", "__radd__"),
+    np.subtract:    ("__sub__", "__rsub__"),
+    np.multiply:    ("__mul__", "__rmul__"),
+    np.true_divide: ("__truediv__", "__rtruediv__"),
+    np.power:       ("__pow__", "__rpow__"),
+    np.matmul:      ("__matmul__", "__rmatmul__"),
+}
+
+def _matmul(a, b) -> "Dual":
+    '''矩阵乘法，把导数部分的最后一维移到最前面，逐个方向按乘积法则计算'''
+    av, bv = _value(a), _value(b)
+    der = 0
+    if isinstance(a, Dual):
+        der = der + np.matmul(np.moveaxis(a.der, -1, 0), bv)
+    if isinstance(b, Dual):
+        bd = np.moveaxis(b.der, -1, 0)
+        der = der + (np.matmul(av, bd.T).T if b.ndim == 1 else np.matmul(av, bd))
+    return Dual(np.matmul(av, bv), np.moveaxis(der, 0, -1))
+
+class Dual:
+    '''对偶数 val + der*eps，der 的形状为 val.shape + (k,)'''
+    __slots__ = ("val", "der")
+    __array_priority__ = 1000
+
+    def __init__(self, val, der):
+        self.val = val
+        self.der = der
+
+    @property
+    def shape(self): return np.shape(self.val)
+    @property
+    def ndim(self): return np.ndim(self.val)
+    @property
+    def size(self): return np.size(self.val)
+    @property
+    def T(self): return self.transpose()
+
+    def __getitem__(self, index):
+        return Dual(self.val[index], self.der[index])
+    def reshape(self, *shape):
+        if len(shape) == 1 and not isinstance(shape[0], int): shape = tuple(shape[0])
+        val = np.reshape(self.val, shape)
+        return Dual(val, np.reshape(self.der, val.shape+self.der.shape[-1:]))
+    def flatten(self):
+        return self.reshape(-1)
+    def transpose(self):
+        axes = tuple(range(self.ndim))[::-1]
+        return Dual(np.transpose(self.val, axes), np.transpose(self.der, axes+(self.ndim,)))
+
+    def __add__(self, other):
+        if isinstance(other, Dual): return _make(self.val + other.val, self.der + other.der)
+        return _make(self.val + other, self.der)
+    __radd__ = __add__
+    def __sub__(self, other):
+        if isinstance(other, Dual): return _make(self.val - other.val, self.der - other.der)
+        return _make(self.val - other, self.der)
+    def __rsub__(self, other):
+        return _make(other - self.val, -self.der)
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return _make(self.val*other.val, _expand(self.val)*other.der + _expand(other.val)*self.der)
+        return _make(self.val*other, _expand(other)*self.der)
+    __rmul__ = __mul__
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            return _make(self.val/other.val,
+                         (self.der*_expand(other.val) - _expand(self.val)*other.der)/_expand(other.val**2))
+        return _make(self.val/other, self.der/_expand(other))
+    def __rtruediv__(self, other):
+        return _make(other/self.val, -_expand(other/self.val**2)*self.der)
+    def __pow__(self, other):
+        if isinstance(other, Dual):
+            val = self.val**other.val
+            return _make(val, _expand(val*np.log(self.val))*other.der
+                              + _expand(other.val*self.val**(other.val-1))*self.der)
+        return _make(self.val**other, _expand(other*self.val**(other-1))*self.der)
+    def __rpow__(self, other):
+        val = other**self.val
+        return _make(val, _expand(val*np.log(other))*self.der)
+    def __matmul__(self, other): return _matmul(self, other)
+    def __rmatmul__(self, other): return _matmul(other, self)
+    def __neg__(self): return Dual(-self.val, -self.der)
+    def __pos__(self): return self
+    def __abs__(self): return _make(abs(self.val), _expand(np.sign(self.val))*self.der)
+
+    def __lt__(self, other): return self.val <  _value(other)
+    def __le__(self, other): return self.val <= _value(other)
+    def __gt__(self, other): return self.val >  _value(other)
+    def __ge__(self, other): return self.val >= _value(other)
+    def __eq__(self, other): return self.val == _value(other)
+    def __ne__(self, other): return self.val != _value(other)
+    __hash__ = None
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__" or kwargs: return NotImplemented
+        if ufunc in _operators:
+            a, b = inputs
+            if isinstance(a, Dual): return getattr(a, _operators[ufunc][0])(b)
+            return getattr(b, _operators[ufunc][1])(a)
+        if ufunc in _derivatives:
+            (a,) = inputs
+            return _make(ufunc(a.val), _expand(_derivatives[ufunc](a.val))*a.der)
+        if ufunc.nout == 1 and ufunc.types[0][-1] == "?":     #比较运算，只比较数值部分
+            return ufunc(*[_value(a) for a in inputs])
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Dual({self.val!r}, {self.der!r})"
+
+def unpack(result, k:int) -> tuple[np.ndarray, np.ndarray]:
+    '''把 f 的返回值拆为数值部分与导数部分
+    f 可能返回 Dual、由 Dual 组成的 object array（比如 np.array([[x[0,0]**2], ...])），或者常数'''
+    if isinstance(result, Dual):
+        return result.val, result.der
+    if isinstance(result, np.ndarray) and result.dtype == object:
+        flat = result.flatten()
+        val = np.array([_value(a) for a in flat]).reshape(result.shape)
+        der = np.array([a.der if isinstance(a, Dual) else np.zeros(k) for a in flat])
+        return val, der.reshape(result.shape+(k,))
+    return result, np.zeros(np.shape(result)+(k,))
+
+def derivative(f:Callable[[X],Y], x:X) -> tuple[Y, Y]:
+    '''一次调用 f 得到 f(x) 与 f'(x)
+    x 为 array 时，要求 f 逐元素计算，得到的是逐元素的导数'''
+    val, der = unpack(f(Dual(x, np.ones(np.shape(x)+(1,)))), 1)
+    return val, der[...,0]
+
+def jacobian(f:Callable[[np.ndarray],np.ndarray], x:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''一次调用 f 得到 f(x) 与 f 在 x 处的雅可比矩阵 (f(x).size * x.size)'''
+    n = x.size
+    val, der = unpack(f(Dual(x, np.eye(n).reshape(x.shape+(n,)))), n)
+    return val, der.reshape(np.size(val), n)
+
+def accepts_dual(f:Callable, x, *args, der:np.ndarray = None) -> tuple[np.ndarray, np.ndarray]|None:
+    '''试算一次 f(Dual(x, der), *args)，判断 f 能否接受 Dual
+    der 默认为全 1，即逐元素求导（同 derivative）；传入单位阵时得到雅可比矩阵（同 jacobian）。
+    能接受时返回试算结果拆出的 (val, der)，调用方应当把它用作第一次计算 f 与导数的结果，而不是再算一次；
+    f 对 Dual 抛出 TypeError 时（比如用了 math 模块的函数）返回 None，其他异常照常抛出。'''
+    if der is None: der = np.ones(np.shape(x)+(1,))
+    try:
+        result = f(Dual(x, der), *args)
+    except TypeError:
+        return None
+    return unpack(result, np.shape(der)[-1])
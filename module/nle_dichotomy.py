@@ -4,28 +4,36 @@
 '''解非线性方程的二分法'''
 
 import numpy as np
+import math
 from numbers import Number
 from typing import Callable
+from concurrent.futures import Executor
+from functools import partial
 
 try:
     from ._matfunc import *
-    from .iter_condition import StopCondition, stopAt
+    from .iter_condition import StopCondition, stopAt, vstopAt
     from .ode__typing import X, Y, X0, Xmin, Xmax
+    from .nle__cache import use_cache
 except:
     from _matfunc import *
-    from iter_condition import StopCondition, stopAt
+    from iter_condition import StopCondition, stopAt, vstopAt
     from ode__typing import X, Y, X0, Xmin, Xmax
+    from nle__cache import use_cache
 
 def dichotomy(
     f:Callable[[X],Y],
     xmin:Xmin,
     xmax:Xmax,
     stop:StopCondition = stopAt(),
-    showlog:bool = False
+    showlog:bool = False,
+    cache:bool|int|Callable = None
     ) -> X:
     '''二分法 / dichotomy
     解 f(x) = 0 的方法
-    要求 f 是连续函数，f(xmin)*f(xmax)<=0'''
+    要求 f 是连续函数，f(xmin)*f(xmax)<=0
+    cache 不为 None 时用 EvalCache 包装 f，见 nle__cache.use_cache'''
+    f = use_cache(f, cache)
     if (fxmin:=f(xmin)) == 0: return xmin
     if (fxmax:=f(xmax)) == 0: return xmax
     if (fxmin < 0 and fxmax < 0) or (fxmin > 0 and fxmax > 0):
@@ -56,11 +64,14 @@ def false_position(
     xmin:Xmin,
     xmax:Xmax,
     stop:StopCondition = stopAt(),
-    showlog:bool = False
+    showlog:bool = False,
+    cache:bool|int|Callable = None
     ) -> X:
     '''试位法 / regula falsi method / false position method
     解 f(x) = 0 的方法
-    要求 f 是连续函数，f(xmin)*f(xmax)<=0'''
+    要求 f 是连续函数，f(xmin)*f(xmax)<=0
+    cache 不为 None 时用 EvalCache 包装 f，见 nle__cache.use_cache'''
+    f = use_cache(f, cache)
     if (fxmin:=f(xmin)) == 0: return xmin
     if (fxmax:=f(xmax)) == 0: return xmax
     if (fxmin < 0 and fxmax < 0) or (fxmin > 0 and fxmax > 0):
@@ -85,4 +96,315 @@ def false_position(
             fxmax = fnewx
         time += 1
         if showlog: print(f"第{time}步区间：[{xmin}, {xmax}]")
-    return (xmin+xmax)/2
\ No newline at end of file
+    return (xmin+xmax)/2
+
+def Brent(
+    f:Callable[[X],Y],
+    xmin:Xmin,
+    xmax:Xmax,
+    stop:StopCondition = stopAt(),
+    showlog:bool = False,
+    xtol:Number = None,
+    cache:bool|int|Callable = None
+    ) -> X:
+    '''Brent 方法 / Brent's method
+    解 f(x) = 0 的方法
+    要求 f 是连续函数，f(xmin)*f(xmax)<=0
+
+    始终保持 f(b)*f(c)<=0 的区间 [b, c]，其中 b 是目前最好的近似解，a 是上一个 b。
+    每步优先用 a, b, c 三点的反二次插值（a == c 时为弦截法）求新的 b，
+    但若插值点不在区间内，或者步长没有小于前前一步的一半，则改用二分法。
+    此外区间 [b, c] 连续两步没有缩小一半时强制二分（重根附近插值点总在根的同一侧，区间缩得很慢），
+    上一次是靠强制二分才缩小一半的，则只等一步，因此最坏情况下 f 的计算次数也只是二分法的约两倍，而单根附近有超线性收敛。
+
+    xtol 为解的绝对容许误差，None 时取 stop 的误差限 e（stopAt, astopAt, vstopAt 得到的 stop 都带有 e）；
+    自己编写的 StopCondition 没有 e 时 xtol 取 0，会一直迭代到相邻浮点数的距离，这时请直接给出 xtol。
+    同 zeroin 一样，每步的步长至少为 tol = 2*ulp(b) + xtol/2，区间缩到 2*tol 以内即停止，
+    不会在容许误差以下的距离上浪费 f 的计算。
+    cache 不为 None 时用 EvalCache 包装 f，见 nle__cache.use_cache'''
+    f = use_cache(f, cache)
+    a, b = xmin, xmax
+    if (fa:=f(a)) == 0: return a
+    if (fb:=f(b)) == 0: return b
+    if (fa < 0 and fb < 0) or (fa > 0 and fb > 0):
+        raise ValueError("需要f(xmin)*f(xmax)<=0")
+    c, fc = b, fb
+    d = e = b - a
+    if xtol is None: xtol = getattr(stop, "e", 0)
+    width, mark, patience = abs(b - a), 0, 2    #区间上一次缩小一半时的宽度与步数，此后最多允许几步插值
+    bisect = False
+
+    time = 0
+    if showlog: print(f"开始Brent方法，初始区间为[{xmin}, {xmax}]")
+
+    while True:
+        if (fb > 0 and fc > 0) or (fb < 0 and fc < 0):
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):           #保证 b 是最好的近似解
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = 2*math.ulp(b) + xtol/2
+        m = (c - b)/2
+        if fb == 0 or abs(m) <= tol or stop(b, c, time): break
+        if abs(c - b) <= width/2:       #区间缩小了一半；若是靠强制二分，说明插值很慢，此后只等一步
+            width, mark, patience = abs(c - b), time, 1 if bisect else 2
+        bisect = time - mark >= patience
+
+        if not bisect and abs(e) >= tol and abs(fa) > abs(fb):
+            s = fb/fa
+            if a == c:                  #弦截法
+                p = 2*m*s
+                q = 1 - s
+            else:                       #反二次插值
+                q = fa/fc
+                r = fb/fc
+                p = s*(2*m*q*(q-r) - (b-a)*(r-1))
+                q = (q-1)*(r-1)*(s-1)
+            if p > 0: q = -q
+            else: p = -p
+            if 2*p < min(3*m*q - abs(tol*q), abs(e*q)):
+                e, d = d, p/q
+            else:
+                e = d = m
+        else:
+            e = d = m
+        a, fa = b, fb
+        b += d if abs(d) > tol else math.copysign(tol, m)
+        fb = f(b)
+        time += 1
+        if showlog: print(f"第{time}步区间：[{min(b, c)}, {max(b, c)}]")
+    if showlog and fb == 0: print(f"在迭代过程中找到解{b}")
+    return b
+
+#以下为批量版本：同时求解许多个互相独立的 f(x) = 0，每个区间称为一路
+#要求 f 可以直接作用于 array（即逐元素计算），每次迭代只对尚未停止的各路调用一次 f
+#各路不同的参数放在 args 中，每次调用时按尚未停止的各路取出，即 f(x, *args)
+#比如求分布函数的许多个分位数时，f = lambda x, q: cdf(x) - q, args = (q,)
+#stop 对每一路分别判断，默认的 vstopAt 与 stopAt 的判断条件相同
+#返回解、各路的迭代次数、各路是否收敛（即停止时满足 stop 的误差条件，而不是达到最大迭代次数或出现 nan），
+#是否收敛用 stop.converged 判断，所以 stop 需要有 converged 方法（见 iter_condition.vstopAt）
+
+def _batch_broadcast(*arrays) -> tuple[tuple, list[np.ndarray]]:
+    '''把各路的初值与参数广播为相同的形状后展平（复制），返回 (形状, 展平后的各 array)
+    nle_iter 中的批量版本也使用这个方法'''
+    shape = np.broadcast_shapes(*[np.shape(a) for a in arrays])
+    return shape, [np.broadcast_to(a, shape).flatten() for a in arrays]
+
+def _batch_retire(stop, new, old, time, active, converged):
+    '''判断各路是否停止，记录收敛标志，返回尚未停止的各路
+    nle_iter 中的批量版本也使用这个方法'''
+    finite = np.isfinite(new)
+    done = stop(new, old, time) | ~finite
+    converged[active[done]] = stop.converged(new[done], old[done]) & finite[done]
+    return active[~done]
+
+def _batch_init(f, xmin, xmax, args):
+    shape, (xmin, xmax, *args) = _batch_broadcast(np.asarray(xmin, dtype=float), np.asarray(xmax, dtype=float), *args)
+    fxmin, fxmax = f(xmin, *args), f(xmax, *args)
+    if ((fxmin < 0) & (fxmax < 0) | (fxmin > 0) & (fxmax > 0)).any():
+        raise ValueError("需要f(xmin)*f(xmax)<=0")
+    result = np.full(xmin.shape, np.nan)
+    result[fxmax == 0] = xmax[fxmax == 0]
+    result[fxmin == 0] = xmin[fxmin == 0]
+    converged = (fxmin == 0) | (fxmax == 0)
+    active = np.flatnonzero(~converged)
+    return shape, args, xmin, xmax, fxmin, fxmax, result, np.zeros(xmin.size, dtype=int), converged, active
+
+def dichotomy_batch(
+    f:Callable[...,np.ndarray],
+    xmin:np.ndarray,
+    xmax:np.ndarray,
+    args:tuple[np.ndarray,...] = (),
+    stop:StopCondition = vstopAt(),
+    showlog:bool = False
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''批量二分法
+    xmin, xmax 以及 args 中的各参数为形状相同（或可以广播）的 array，
+    返回同样形状的 (解, 各路的迭代次数, 各路是否收敛)，stop 按各路区间的两端判断
+    要求 f 是连续函数，逐元素有 f(xmin)*f(xmax)<=0'''
+    shape, args, xmin, xmax, fxmin, fxmax, result, iterations, converged, active = _batch_init(f, xmin, xmax, args)
+    k = np.where(fxmin < 0, -1, 1)
+    del fxmin, fxmax
+
+    time = 0
+    if showlog: print(f"开始批量二分法，共{xmin.size}路")
+
+    while active.size:
+        done = stop(xmin[active], xmax[active], time)
+        stopped = active[done]
+        result[stopped] = (xmin[stopped]+xmax[stopped])/2
+        converged[stopped] = stop.converged(xmin[stopped], xmax[stopped])
+        active = active[~done]
+        if not active.size: break
+        newx = (xmin[active]+xmax[active])/2
+        fnewx = f(newx, *[arg[active] for arg in args])*k[active]
+        found = fnewx == 0
+        result[active[found]] = newx[found]; converged[active[found]] = True
+        right = fnewx > 0
+        xmin[active[right]] = newx[right]
+        xmax[active[~right]] = newx[~right]
+        time += 1
+        iterations[active] = time
+        active = active[~found]
+        if showlog: print(f"第{time}步，尚有{active.size}路未停止")
+    return result.reshape(shape), iterations.reshape(shape), converged.reshape(shape)
+
+def false_position_batch(
+    f:Callable[...,np.ndarray],
+    xmin:np.ndarray,
+    xmax:np.ndarray,
+    args:tuple[np.ndarray,...] = (),
+    stop:StopCondition = vstopAt(),
+    showlog:bool = False
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''批量试位法（Illinois 改进）
+    xmin, xmax 以及 args 中的各参数为形状相同（或可以广播）的 array，
+    返回同样形状的 (解, 各路的迭代次数, 各路是否收敛)
+    要求 f 是连续函数，逐元素有 f(xmin)*f(xmax)<=0
+
+    试位法的区间往往有一端始终不动，区间宽度不会趋于零，所以 stop 按相邻两次的插值点判断，
+    返回最后的插值点。同一端连续两次不动时，把这一端的函数值减半（Illinois 方法），
+    使插值点越过根，两端都得以移动，单根附近约 1.44 阶收敛。'''
+    shape, args, xmin, xmax, fxmin, fxmax, result, iterations, converged, active = _batch_init(f, xmin, xmax, args)
+    k = np.where(fxmin < 0, -1, 1)
+    side = np.zeros(xmin.size, dtype=int)        #上一次替换的一端：1 为 xmin，-1 为 xmax
+
+    time = 0
+    if showlog: print(f"开始批量试位法，共{xmin.size}路")
+
+    while active.size:
+        a, b, fa, fb = xmin[active], xmax[active], fxmin[active], fxmax[active]
+        newx = (b*fa-a*fb)/(fa-fb)
+        fnewx = f(newx, *[arg[active] for arg in args])
+        old = result[active]; result[active] = newx
+        found = fnewx == 0
+        converged[active[found]] = True
+        right = fnewx*k[active] > 0
+        fxmax[active[right & (side[active] == 1)]] /= 2     #xmax 连续两次不动
+        fxmin[active[~right & (side[active] == -1)]] /= 2   #xmin 连续两次不动
+        xmin[active[right]], fxmin[active[right]] = newx[right], fnewx[right]
+        xmax[active[~right]], fxmax[active[~right]] = newx[~right], fnewx[~right]
+        side[active] = np.where(right, 1, -1)
+        time += 1
+        iterations[active] = time
+        active = _batch_retire(stop, newx[~found], old[~found], time, active[~found], converged)
+        if showlog: print(f"第{time}步，尚有{active.size}路未停止")
+    return result.reshape(shape), iterations.reshape(shape), converged.reshape(shape)
+
+def _evaluate(f, x:np.ndarray, vectorized:bool, executor:Executor) -> np.ndarray:
+    '''在一组点上计算 f，f 可以直接作用于 array 时只调用一次'''
+    if vectorized: return np.asarray(f(x), dtype=float)
+    if executor is not None: return np.array(list(executor.map(f, x, chunksize=64)), dtype=float)
+    return np.array([f(xi) for xi in x], dtype=float)
+
+def scan_roots(
+    f:Callable[[X],Y],
+    xmin:Xmin,
+    xmax:Xmax,
+    n:int = 1000,
+    stop:StopCondition = None,
+    vectorized:bool = True,
+    executor:Executor = None,
+    depth:int = 30,
+    showlog:bool = False
+    ) -> np.ndarray:
+    '''求 f 在 [xmin, xmax] 内的全部根，从小到大返回
+
+    先在 n 等分的网格上计算 f，相邻两点变号的小区间就是一个根的区间。
+    不变号但 |f| 取得局部极小值的地方，可能是 f 与 x 轴相切或近乎相切（二重根或一对很近的根），
+    在其两侧的两个小区间内再取 8 等分的网格，逐层放大 depth 次：
+     出现变号则得到新的区间；
+     否则用极小值点及其两侧共三点的抛物线估计 f 的极值，
+     若极值与 f 不再异号，且绝对值不小于极小值点处 |f| 的一半，说明不是根，放弃；
+     放大 depth 次后或者区间的相对宽度小于 1e-8 时仍未放弃，则把该处视为二重根。
+    各层所有候选位置的 f 都合并为一次调用计算。
+
+    最后细化所有的区间：
+     vectorized 为 True 时，要求 f 可以直接作用于 array，用 dichotomy_batch 同时细化；
+     否则若给出 executor（concurrent.futures 的线程池或进程池），则网格上的 f 与每个区间的 Brent 方法都交给 executor 计算，
+      使用进程池时 f（以及 stop）需要可以被 pickle，比如定义在模块顶层的函数（stopAt 返回的是局部函数，不能 pickle，只能用默认的 stop）；
+     否则逐个区间使用 Brent 方法。
+    stop 为细化时的停止条件，None 时使用各方法的默认值：
+     vectorized 为 True 时为逐元素判断的 vstopAt（见 iter_condition），否则为 Brent 使用的 stopAt。
+    网格间距内有多于两个根时可能遗漏，需要增大 n。'''
+    evaluate = lambda x: _evaluate(f, x, vectorized, executor)
+    x = np.linspace(xmin, xmax, n+1)
+    fx = evaluate(x)
+    roots = [x[fx == 0]]
+    sign = np.sign(fx)
+    cells = np.flatnonzero(sign[:-1]*sign[1:] < 0)
+    a, b = [x[cells]], [x[cells+1]]
+
+    #|f| 不变号的局部极小值，逐层放大
+    absf = np.abs(fx)
+    i = 1 + np.flatnonzero((sign[:-2] == sign[1:-1]) & (sign[1:-1] == sign[2:]) & (sign[1:-1] != 0)
+                           & (absf[1:-1] < absf[:-2]) & (absf[1:-1] <= absf[2:]))
+    lo, hi = x[i-1], x[i+1]
+    if showlog: print(f"网格上找到{cells.size}个变号区间，{i.size}个可能相切的极小值")
+    t = np.linspace(0, 1, 9)
+    for level in range(depth):
+        if not lo.size: break
+        xs = lo[:,None] + (hi-lo)[:,None]*t
+        fs = evaluate(xs.flatten()).reshape(xs.shape)
+        sign = np.sign(fs)
+        zero = (fs == 0).any(axis=1)
+        roots.append(xs[fs == 0])
+        change = (sign[:,:-1]*sign[:,1:] < 0) & ~zero[:,None]
+        r, j = np.nonzero(change)
+        a.append(xs[r, j]); b.append(xs[r, j+1])
+        j = np.clip(np.argmin(np.abs(fs), axis=1), 1, 7)
+        r = np.arange(j.size)
+        f0, f1, f2 = fs[r, j-1], fs[r, j], fs[r, j+1]
+        d2 = f2 - 2*f1 + f0
+        vertex = f1 - np.divide((f2-f0)**2, 8*d2, out=np.zeros_like(d2), where=d2!=0)
+        keep = ~zero & ~change.any(axis=1) & ((vertex*f1 <= 0) | (np.abs(vertex) < np.abs(f1)/2))
+        lo, hi = xs[keep, j[keep]-1], xs[keep, j[keep]+1]
+        tiny = hi - lo < 1e-8*(np.abs(lo) + (xmax-xmin))  #二重根本身只能确定到约 sqrt(机器精度) 的相对精度
+        roots.append((lo[tiny]+hi[tiny])/2)
+        lo, hi = lo[~tiny], hi[~tiny]
+        if showlog: print(f"第{level+1}层放大后，尚有{lo.size}个可能相切的极小值")
+    roots.append((lo+hi)/2)
+
+    a, b = np.concatenate(a), np.concatenate(b)
+    kwargs = {} if stop is None else {"stop": stop}
+    if vectorized:
+        roots.append(dichotomy_batch(f, a, b, **kwargs)[0])
+    elif executor is not None:
+        roots.append(np.array(list(executor.map(partial(Brent, f, **kwargs), a, b)), dtype=float))
+    else:
+        roots.append(np.array([Brent(f, ai, bi, **kwargs) for ai, bi in zip(a, b)], dtype=float))
+    return np.sort(np.concatenate(roots))
+
+if __name__ == "__main__":
+    #在一组常见的测试函数上统计 f 的计算次数
+    class counter:
+        def __init__(self, func): self.func = func; self.times = 0
+        def __call__(self, x): self.times += 1; return self.func(x)
+    problems = [
+        ("x**3-2*x-5",  lambda x: x**3-2*x-5,       2, 3),
+        ("cos(x)-x",    lambda x: math.cos(x)-x,    0, 1),
+        ("exp(x)-2",    lambda x: math.exp(x)-2,    0, 2),
+        ("x**10-1",     lambda x: x**10-1,          0, 1.3),
+        ("(x-1)**3",    lambda x: (x-1)**3,         0, 2.5),
+        ("(x-0.7)**5",  lambda x: (x-0.7)**5,       0, 3),      #五重根
+        ("atan(x-0.3)", lambda x: math.atan(x-0.3), -10, 20),
+    ]
+    class stop_counter:                 #记录最后一次判断时的迭代次数，达到 max_iter 说明没有收敛
+        def __init__(self, stop): self.stop = stop; self.times = 0
+        def __call__(self, before, after, times): self.times = times; return self.stop(before, after, times)
+    for name, func, xmin, xmax in problems:
+        print(f"{name}:")
+        for method in (dichotomy, false_position, Brent):
+            f = counter(func)
+            stop = stop_counter(stopAt(e=1e-12))
+            x = method(f, xmin, xmax, stop=stop)
+            note = "（达到最大迭代次数，未收敛）" if stop.times >= stop.stop.max_iter else ""
+            print(f"  {method.__name__:>15}: x = {x:.15f}, f 计算次数：{f.times}{note}")
+
+    #批量版本：同时求 x**3 = q 的许多个根，返回各路的迭代次数与是否收敛
+    q = np.linspace(0.1, 10, 100000)
+    for method in (dichotomy_batch, false_position_batch):
+        x, iterations, converged = method(lambda x, q: x**3-q, 0., 5., args=(q,))
+        print(f"{method.__name__}: 最大误差 {np.abs(x-np.cbrt(q)).max():.1e}，"
+              f"迭代次数 {iterations.min()}~{iterations.max()}，全部收敛：{converged.all()}")
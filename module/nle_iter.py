@@ -5,15 +5,22 @@
 
 from typing import Callable
 import math
+import numpy as np
 
 try:
     from ._matfunc import *
-    from .iter_condition import StopCondition, stopAt
+    from .iter_condition import StopCondition, stopAt, vstopAt
     from .ode__typing import X, Y, X0, X1, X2
+    from .nle__dual import accepts_dual, derivative
+    from .nle__cache import use_cache
+    from .nle_dichotomy import _batch_broadcast, _batch_retire
 except:
     from _matfunc import *
-    from iter_condition import StopCondition, stopAt
+    from iter_condition import StopCondition, stopAt, vstopAt
     from ode__typing import X, Y, X0, X1, X2
+    from nle__dual import accepts_dual, derivative
+    from nle__cache import use_cache
+    from nle_dichotomy import _batch_broadcast, _batch_retire
 
 #从方程到迭代法
 # 对于 f(x) = 0，通过变形得到 x = phi(x)
@@ -31,8 +38,11 @@ def fpi(
     phi: Callable[[X],Y],
     x0: X0 = 0,
     stop: StopCondition = stopAt(),
-    showlog: bool = False) -> X:
-    '''Fixed point iteration 不动点迭代法'''
+    showlog: bool = False,
+    cache: bool|int|Callable = None) -> X:
+    '''Fixed point iteration 不动点迭代法
+    cache 不为 None 时用 EvalCache 包装 phi，见 nle__cache.use_cache'''
+    phi = use_cache(phi, cache)
     x = x0; time = 0
     if showlog:
         print(f"开始迭代，初值为：{x}")
@@ -63,7 +73,8 @@ def Steffensen_Aitken(
     phi: Callable[[X],Y],
     x0: X0 = 0,
     stop: StopCondition = stopAt(),
-    showlog: bool = False) -> X:
+    showlog: bool = False,
+    cache: bool|int|Callable = None) -> X:
     '''使用 Aitken 加速方法的 Steffensen 迭代法
 
     要求 phi 的导数在邻域内变化足够小。
@@ -81,6 +92,7 @@ def Steffensen_Aitken(
      z 约等于 x[k] - (x[k+1] - x[k])**2 / (x[k+2] - 2*x[k+1] + x[k])
     把右侧估计结果作为迭代结果，就是 Aitken 加速方法。
     '''
+    phi = use_cache(phi, cache)
     x = x0; time = 0
     if showlog: print(f"开始迭代，初值为：{x}")
     while not stop(x, x0, time):
@@ -92,15 +104,79 @@ def Steffensen_Aitken(
         time += 1
     return x
 
+def Anderson(
+    phi: Callable[[X],Y],
+    x0: X0 = 0,
+    m: int = 1,
+    stop: StopCondition = stopAt(),
+    showlog: bool = False,
+    cache: bool|int|Callable = None) -> X:
+    '''使用 Anderson 加速方法的不动点迭代法
+
+    记残差 g(x) = phi(x) - x，保留最近 m 步的
+     dx[i] = x[k-i] - x[k-i-1],  dg[i] = g[k-i] - g[k-i-1]
+    求最小二乘问题 min |g[k] - sum(gamma[i]*dg[i])|，然后取
+     x[k+1] = x[k] + g[k] - sum(gamma[i]*(dx[i] + dg[i]))
+    即为 Anderson 加速方法。
+
+    历史记录存放在预先分配的长度为 m 的数组中，按 k % m 轮换写入，
+    最小二乘问题与各列的顺序无关，所以无需移动数据。
+    标量情形下最小二乘问题只有一个方程，取其最小范数解；
+    m = 1 时就是对 g(x) = 0 的弦截法，每步只需计算一次 phi。
+    '''
+    phi = use_cache(phi, cache)
+    dx = np.zeros(m, dtype=np.result_type(x0, float))
+    dg = np.zeros(m, dtype=np.result_type(x0, float))
+    x = x0; g0 = 0; time = 0
+    if showlog: print(f"开始迭代，初值为：{x}")
+    while not stop(x, x0, time):
+        g = phi(x) - x
+        if time == 0:
+            newx = x + g
+        else:
+            i = (time-1) % m
+            dx[i] = x - x0
+            dg[i] = g - g0
+            k = min(time, m)
+            if (norm2:=np.dot(dg[:k], dg[:k])) == 0:
+                newx = x + g
+            else:
+                gamma = dg[:k]*(g/norm2)
+                newx = x + g - np.dot(dx[:k] + dg[:k], gamma)
+        x0, g0, x = x, g, newx
+        time += 1
+        if showlog: print(f"第{time}步迭代结果：{x}")
+    return x
+
+def _newton_quotient(f, df, x0) -> Callable[[X],Y]:
+    '''返回 x -> f(x)/df(x)
+    df 为 None 时，若 f 能接受对偶数，则用自动微分一次调用 f 同时得到 f(x) 与 df(x)；
+    否则使用默认的数值导数，每步需要额外计算两次 f。'''
+    if df == None:
+        if (trial:=accepts_dual(f, x0)) is not None:
+            first = trial[0]/trial[1][...,0]
+            def quotient(x):
+                nonlocal first
+                if first is not None and x is x0:   #第一步在 x0 处，使用试算的结果
+                    q, first = first, None
+                    return q
+                fx, dfx = derivative(f, x)
+                return fx/dfx
+            return quotient
+        df = lambda x: (f(x+(1e-5))-f(x-(1e-5)))*(5e4)
+    return lambda x: f(x)/df(x)
+
 def Newton(
     f:Callable[[X],Y],
     x0:X0=0,
     df:Callable[[X],Y] = None,
     stop:StopCondition = stopAt(),
-    showlog: bool = False) -> X:
+    showlog: bool = False,
+    cache: bool|int|Callable = None) -> X:
     '''解 f(x) = 0 的牛顿迭代法
-    df 为 f 的导数，如果 df 为 None，则使用默认的数值导数。
+    df 为 f 的导数，如果 df 为 None，则用自动微分（f 能接受对偶数时，见 nle__dual）或默认的数值导数。
     从 x0 开始迭代
+    cache 不为 None 时用 EvalCache 包装 f 与 df，见 nle__cache.use_cache
 
     这个方法有一些很复杂的地方，涉及到混沌理论，但这里不讨论
     这些复杂的地方...简而言之，牛顿迭代法的收敛性取决于初值如何。
@@ -110,8 +186,8 @@ def Newton(
     当所求的为重根 multiple root 时，应该按照重数 multiplicity
     来改良迭代方式。
     '''
-    if df == None: df = lambda x: (f(x+(1e-5))-f(x-(1e-5)))*(5e4)
-    phi = lambda x0: x0 - f(x0)/df(x0)
+    quotient = _newton_quotient(use_cache(f, cache), use_cache(df, cache), x0)
+    phi = lambda x0: x0 - quotient(x0)
     return fpi(phi, x0, stop, showlog)
 
 def Newton_relaxation(
@@ -120,10 +196,11 @@ def Newton_relaxation(
     df:Callable[[X],Y] = None,
     stop:StopCondition = stopAt(),
     showlog: bool = False,
-    m:int = 1) -> X:
+    m:int = 1,
+    cache: bool|int|Callable = None) -> X:
     '''按照重数 m 设置松弛系数，以改良迭代方式的牛顿迭代法。'''
-    if df == None: df = lambda x: (f(x+(1e-5))-f(x-(1e-5)))*(5e4)
-    phi = lambda x0: x0 - m*f(x0)/df(x0)
+    quotient = _newton_quotient(use_cache(f, cache), use_cache(df, cache), x0)
+    phi = lambda x0: x0 - m*quotient(x0)
     return fpi(phi, x0, stop, showlog)
 
 def Newton_derivative(
@@ -133,14 +210,16 @@ def Newton_derivative(
     mu:Callable[[X],Y] = None,
     dmu:Callable[[X],Y]= None,
     stop:StopCondition = stopAt(),
-    showlog: bool = False) -> X:
+    showlog: bool = False,
+    cache: bool|int|Callable = None) -> X:
     '''利用代数原理，求 f(x) 的重根等同于求 f(x)/df(x) 的单根的牛顿迭代法。
     其中 mu(x) = f(x)/df(x), dmu 为 mu 的导数
-    特别的，f 和 mu 请至少输入一个。'''
+    特别的，f 和 mu 请至少输入一个。
+    默认的数值导数会在 x, x+h, x-h 处反复计算，适合使用 cache（见 nle__cache.use_cache）'''
     if mu == None:
         if f == None: raise ValueError("f 和 mu 至少要输入一个")
-        if df == None: df = lambda x: (f(x+(1e-5))-f(x-(1e-5)))*(5e4)
-        mu = lambda x: f(x)/df(x)
+        mu = _newton_quotient(use_cache(f, cache), use_cache(df, cache), x0)
+    mu, dmu = use_cache(mu, cache), use_cache(dmu, cache)
     if dmu== None: dmu= lambda x: (mu(x+(1e-5))-mu(x-(1e-5)))*(5e4)
     phi = lambda x0: x0 - mu(x0)/dmu(x0)
     return fpi(phi, x0, stop, showlog)
@@ -150,7 +229,8 @@ def secant(
     x0:X0=0,
     x1:X1=1,
     stop:StopCondition = stopAt(),
-    showlog: bool = False) -> X:
+    showlog: bool = False,
+    cache: bool|int|Callable = None) -> X:
     '''弦截法（二步法）
     类似牛顿法，但是取 (f(x[k]) - f(x[k-1]))/(x[k] - x[k-1]) 作为数值微分
     该方法有 (math.sqrt(5) + 1)/2 约等于 1.618 阶收敛
@@ -158,6 +238,7 @@ def secant(
     和牛顿法相似，都是对 f 进行线性插值，然后按线性插值结果求解
     但牛顿法的插值只考虑一个点的函数值和其斜率
     而弦截法的插值是对两个点进行插值'''
+    f = use_cache(f, cache)
     x  = [x1, x0]
     fx = [f(x1), f(x0)]
     time = 0
@@ -176,7 +257,8 @@ def parabolic(
     x1:X1=1,
     x2:X2=2,
     stop:StopCondition = stopAt(),
-    showlog: bool = False) -> X:
+    showlog: bool = False,
+    cache: bool|int|Callable = None) -> X:
     '''抛物线法（三步法）
     此方法使用二次多项式对初始的三个点进行插值，
     然后求二次多项式的根
@@ -187,6 +269,7 @@ def parabolic(
     
     即便初值都为实数，抛物线法也可以求复根；
     而牛顿法仅在初值为复数或函数为复函数时才能求复根。'''
+    f = use_cache(f, cache)
     x   = [x2, x0, x1]
     fx  = [f(x2), f(x0), f(x1)]
     dfx = [(fx[0]-fx[-1])/(x[0]-x[-1]),
@@ -206,6 +289,127 @@ def parabolic(
         if showlog: print(f"第{time}步迭代结果：{newx}")
     return x[0]
 
+def Aberth(
+    coef:np.ndarray,
+    roots0:np.ndarray = None,
+    stop:StopCondition = vstopAt(),
+    showlog: bool = False) -> np.ndarray:
+    '''求多项式全部（复）根的 Aberth-Ehrlich 方法
+    coef 为从最高次项开始的系数，形状为 (n+1,)；
+    也可以是形状为 (m, n+1) 的 m 个同为 n 次的多项式，此时同时求解，返回形状为 (m, n) 的根。
+    stop 逐个根判断，一个多项式的根全部满足 stop 后，就不再参与迭代。
+
+    对当前的近似根 z[i]，记 r[i] = p(z[i])/p'(z[i])，取
+     z[i] = z[i] - r[i]/(1 - r[i]*sum(1/(z[i]-z[j]) for j != i))
+    相当于对 p(z)/prod(z-z[j] for j != i) 使用牛顿法，其余的根互相排斥，不会收敛到同一个根。
+    单根附近三阶收敛，每步为 O(n^2)，全部以 array 运算完成。
+    p 与 p' 用秦九韶（Horner）算法同时计算。
+
+    初值 roots0 为 None 时，取以 Fujiwara 界为半径的圆周上的 n 个点，并略微旋转以避免对称性。
+    记 c[k] = coef[k]/coef[0]，Fujiwara 界 2*max(|c[1]|, |c[2]|**(1/2), ..., |c[n]/2|**(1/n)) 是根的模的上界。'''
+    coef = np.asarray(coef)
+    if (coef[...,0] == 0).any(): raise ValueError("最高次项系数不能为零")
+    shape = coef.shape[:-1]
+    c = (coef/coef[...,:1]).reshape(-1, coef.shape[-1])
+    n = c.shape[-1] - 1
+    if roots0 is None:
+        k = np.arange(1, n+1)
+        bound = np.abs(c[:,1:]); bound[:,-1] /= 2
+        radius = 2*np.max(bound**(1/k), axis=-1, keepdims=True)
+        z = radius*np.exp(1j*(2*np.pi*k/n + 0.4))
+    else:
+        z = np.array(np.broadcast_to(roots0, shape+(n,)), dtype=complex).reshape(-1, n)
+    eye = np.eye(n, dtype=bool)
+
+    active = np.arange(z.shape[0]); time = 0
+    if showlog: print(f"开始迭代，初值为：{z.reshape(shape+(n,))}")
+    while active.size:
+        za, ca = z[active], c[active]
+        p = np.ones_like(za); dp = np.zeros_like(za)
+        for ck in ca[:,1:].T:                   #Horner 算法
+            dp = dp*za + p
+            p = p*za + ck[:,None]
+        ratio = p/dp
+        diff = za[:,:,None] - za[:,None,:]
+        diff[:,eye] = np.inf
+        repulsion = (1/diff).sum(axis=-1)
+        new = za - ratio/(1 - ratio*repulsion)
+        z[active] = new
+        time += 1
+        active = active[~stop(new, za, time).all(axis=-1)]
+        if showlog: print(f"第{time}步迭代结果：{z.reshape(shape+(n,))}")
+    return z.reshape(shape+(n,))
+
+#以下为批量版本：同时求解许多个互相独立的 f(x) = 0，每个初值称为一路
+#要求 f (以及 df) 可以直接作用于 array（即逐元素计算），每次迭代只对尚未停止的各路调用一次
+#各路不同的参数放在 args 中，每次调用时按尚未停止的各路取出，即 f(x, *args)
+#返回解、各路的迭代次数、各路是否收敛（即停止时满足 stop 的误差条件，而不是达到最大迭代次数或出现 nan）
+#stop 需要有 converged 方法（见 iter_condition.vstopAt），用于判断停止的各路是否收敛
+
+def Newton_batch(
+    f:Callable[...,np.ndarray],
+    x0:np.ndarray,
+    df:Callable[...,np.ndarray] = None,
+    args:tuple[np.ndarray,...] = (),
+    stop:StopCondition = vstopAt(),
+    showlog: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''批量牛顿迭代法
+    x0 以及 args 中的各参数为形状相同（或可以广播）的 array
+    df 为 None 时，若 f 能接受对偶数则用自动微分，否则用默认的数值导数（额外计算两次 f）'''
+    shape, (x, *args) = _batch_broadcast(x0, *args)
+    x = x.astype(np.result_type(x.dtype, float))
+    iterations, converged = np.zeros(x.size, dtype=int), np.zeros(x.size, dtype=bool)
+    first = None
+    if df == None:
+        if (trial:=accepts_dual(f, x, *args)) is not None:
+            first = trial[0]/trial[1][...,0]        #各路第一步的 f/df，直接使用
+            quotient = lambda x, *args: np.divide(*derivative(lambda x: f(x, *args), x))
+        else:
+            quotient = lambda x, *args: f(x, *args)/((f(x+(1e-5), *args)-f(x-(1e-5), *args))*(5e4))
+    else:
+        quotient = lambda x, *args: f(x, *args)/df(x, *args)
+
+    active = np.arange(x.size); time = 0
+    if showlog: print(f"开始批量牛顿迭代，共{x.size}路")
+    while active.size:
+        old = x[active]
+        if first is not None: q, first = first, None
+        else: q = quotient(old, *[arg[active] for arg in args])
+        new = old - q
+        x[active] = new
+        time += 1
+        iterations[active] = time
+        active = _batch_retire(stop, new, old, time, active, converged)
+        if showlog: print(f"第{time}步，尚有{active.size}路未停止")
+    return x.reshape(shape), iterations.reshape(shape), converged.reshape(shape)
+
+def secant_batch(
+    f:Callable[...,np.ndarray],
+    x0:np.ndarray,
+    x1:np.ndarray,
+    args:tuple[np.ndarray,...] = (),
+    stop:StopCondition = vstopAt(),
+    showlog: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''批量弦截法
+    x0, x1 以及 args 中的各参数为形状相同（或可以广播）的 array，每步只计算一次 f'''
+    shape, (x, xl, *args) = _batch_broadcast(x1, x0, *args)
+    x = x.astype(np.result_type(x.dtype, xl.dtype, float)); xl = xl.astype(x.dtype)
+    iterations, converged = np.zeros(x.size, dtype=int), np.zeros(x.size, dtype=bool)
+    fx, fxl = f(x, *args), f(xl, *args)
+
+    active = np.arange(x.size); time = 0
+    if showlog: print(f"开始批量弦截法，共{x.size}路")
+    while active.size:
+        old, fold = x[active], fx[active]
+        new = old - fold*(old-xl[active])/(fold-fxl[active])
+        x[active], xl[active], fxl[active] = new, old, fold
+        fx[active] = f(new, *[arg[active] for arg in args])
+        time += 1
+        iterations[active] = time
+        active = _batch_retire(stop, new, old, time, active, converged)
+        if showlog: print(f"第{time}步，尚有{active.size}路未停止")
+    return x.reshape(shape), iterations.reshape(shape), converged.reshape(shape)
+
 if __name__ == "__main__":
     f = lambda x: x**3-3*x-1
     df= lambda x: 3*x**2-3
@@ -214,4 +418,26 @@ if __name__ == "__main__":
     print("弦切法")
     secant(f=f, x0=2, x1=1.9, showlog=True)
     print("抛物线法")
-    parabolic(f=f, x0=1, x1=3, x2=2, showlog=True)
\ No newline at end of file
+    parabolic(f=f, x0=1, x1=3, x2=2, showlog=True)
+
+    #不动点迭代的 phi 计算次数对比，phi(x) = cos(x) 线性收敛
+    class counter:
+        def __init__(self, func): self.func = func; self.times = 0
+        def __call__(self, x): self.times += 1; return self.func(x)
+    for method in (fpi, Steffensen_Aitken, Anderson):
+        phi = counter(math.cos)
+        x = method(phi, x0=1.0, stop=stopAt(e=1e-12))
+        print(f"{method.__name__}: x = {x}, phi 计算次数：{phi.times}")
+
+    #牛顿法使用数值导数与自动微分的对比，f 使用 math.exp 时无法接受对偶数，只能用数值导数
+    class stop_counter:
+        def __init__(self, stop): self.stop = stop; self.times = 0
+        def __call__(self, *args): self.times += 1; return self.stop(*args)
+    for method, x0, funcs in (
+        (Newton, 3.0, (lambda x: math.exp(x) - 4*x, lambda x: np.exp(x) - 4*x)),
+        (Newton_derivative, 2.0, (lambda x: (x-1)**3*math.exp(x), lambda x: (x-1)**3*np.exp(x)))):
+        for name, func in zip(("数值导数", "自动微分"), funcs):
+            f = counter(func)
+            stop = stop_counter(stopAt(e=1e-14))
+            x = method(f, x0=x0, stop=stop)
+            print(f"{method.__name__}（{name}）: x = {x}, f 计算次数：{f.times}, 迭代次数：{stop.times-1}")
@@ -6,15 +6,20 @@
 import numpy as np
 from numbers import Number
 from typing import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
 
 try:
     from ._matfunc import matmul
-    from .iter_condition import StopCondition, astopAt
-    from .le_direct import Gauss
+    from .iter_condition import StopCondition, astopAt, vstopAt
+    from .le_direct import Gauss, Gauss_batch, lu, lu_memorysave_SubstitudeBack
+    from .le_iter import GMRES
+    from .nle__dual import Dual, accepts_dual, jacobian, unpack
 except:
     from _matfunc import matmul
-    from iter_condition import StopCondition, astopAt
-    from le_direct import Gauss
+    from iter_condition import StopCondition, astopAt, vstopAt
+    from le_direct import Gauss, Gauss_batch, lu, lu_memorysave_SubstitudeBack
+    from le_iter import GMRES
+    from nle__dual import Dual, accepts_dual, jacobian, unpack
 
 #类似解方程的不动点迭代法，解方程组同样也有不动点迭代法。
 #这是不动点迭代法的基础形式，与之前方法的区别只在于类型标注不同
@@ -34,33 +39,286 @@ def afpi(
         if showlog: print(f"第{time}步迭代结果：{x.flatten()}")
     return x
 
+def aAnderson(
+    phi: Callable[[np.ndarray],np.ndarray],
+    x0: np.ndarray,
+    m: int = 5,
+    stop: StopCondition = astopAt(),
+    showlog: bool = False) -> np.ndarray:
+    '''使用 Anderson 加速方法的不动点迭代法
+    记残差 g(x) = phi(x) - x，保留最近 m 步的 x 与 g 的差分，作为矩阵 dx, dg 的各列，
+    求最小二乘问题 min |g[k] - dg*gamma|，然后取
+     x[k+1] = x[k] + g[k] - (dx + dg)*gamma
+    
+    dx 和 dg 预先分配为 n*m 的数组，按 k % m 轮换写入对应的列。
+    每步只需计算一次 phi，额外开销是一个 n*m 的最小二乘问题。'''
+    shape = x0.shape
+    n = x0.size
+    dx = np.zeros((n, m), dtype=np.result_type(x0, float))
+    dg = np.zeros((n, m), dtype=np.result_type(x0, float))
+    x = x0; g0 = 0; time = 0
+    if showlog: print(f"开始迭代，初值为：{x.flatten()}")
+    while not stop(x, x0, time):
+        g = (phi(x) - x).reshape(n)
+        if time == 0:
+            newx = x.reshape(n) + g
+        else:
+            i = (time-1) % m
+            dx[:,i] = (x - x0).reshape(n)
+            dg[:,i] = g - g0
+            k = min(time, m)
+            gamma = np.linalg.lstsq(dg[:,:k], g, rcond=None)[0]
+            newx = x.reshape(n) + g - np.matmul(dx[:,:k] + dg[:,:k], gamma)
+        x0, g0, x = x, g, newx.reshape(shape)
+        time += 1
+        if showlog: print(f"第{time}步迭代结果：{x.flatten()}")
+    return x
+
 #对向量的迭代进行收敛性讨论时，要使用度量（范数）与压缩映射原理
 #类似，可以定义收敛性、p阶收敛等。
 
+def jacobi_coloring(sparsity:np.ndarray) -> np.ndarray:
+    '''对雅可比矩阵的稀疏结构 sparsity（bool 矩阵，True 表示可能非零）的各列染色
+    没有公共非零行的列（结构正交）可以染为同一颜色，同时扰动而互不干扰，
+    这就是 Curtis-Powell-Reid 方法。按非零元个数从多到少，贪心地为每列取最小的可用颜色。
+    返回各列的颜色编号，颜色数即计算雅可比矩阵所需的 f 的计算次数。'''
+    sparsity = np.asarray(sparsity, dtype=bool)
+    m, n = sparsity.shape
+    cols_of_row = [np.flatnonzero(sparsity[i,:]) for i in range(m)]
+    rows_of_col = [np.flatnonzero(sparsity[:,j]) for j in range(n)]
+    colors = np.full(n, -1)
+    for j in np.argsort(-sparsity.sum(axis=0), kind="stable"):
+        used = set()
+        for i in rows_of_col[j]:
+            used.update(colors[cols_of_row[i]].tolist())
+        color = 0
+        while color in used: color += 1
+        colors[j] = color
+    return colors
+
+def jacobi_matrix(
+    f:Callable[[np.ndarray], np.ndarray],
+    x:np.ndarray,
+    fx:np.ndarray = None,
+    h:Number = 1e-5,
+    vectorized:bool = False,
+    sparsity:np.ndarray = None,
+    colors:np.ndarray = None,
+    executor:Executor = None) -> np.ndarray:
+    '''用前向差分计算 f 在 x 处的雅可比矩阵，第 j 列为 f 对 x[j] 的偏导数
+    fx 为 f(x)，已经算出时可以传入以节省一次计算。
+
+    vectorized 为 True 时，要求 f 可以逐列计算：输入 n*k 的矩阵，每列为一个点，返回 m*k 的矩阵，
+    此时所有扰动后的点合并为一次调用。
+    给出稀疏结构 sparsity 时，按 jacobi_coloring 的染色（也可以直接传入 colors，但仍需给出 sparsity）同时扰动同色的列，
+    只需计算颜色数那么多次 f（vectorized 时为一次）。
+    给出 executor（concurrent.futures 的进程池或线程池）时，各个扰动后的点交给 executor 同时计算，
+    每算完一个就写入对应的列。使用进程池时 f 需要可以被 pickle，比如定义在模块顶层的函数。'''
+    if colors is not None and sparsity is None: raise ValueError("给出 colors 时需要同时给出 sparsity")
+    if fx is None: fx = f(x)
+    n, m = x.size, fx.size
+    if sparsity is not None and colors is None: colors = jacobi_coloring(sparsity)
+    if colors is None: colors = np.arange(n)
+    k = colors.max() + 1
+    deltax = np.zeros((n, k))
+    deltax[np.arange(n), colors] = h
+    if vectorized:
+        df = (f(x.reshape(n,1) + deltax) - fx.reshape(m,1))/h
+    elif executor is not None:
+        df = np.zeros((m, k))
+        futures = {executor.submit(f, x + deltax[:,c].reshape(x.shape)): c for c in range(k)}
+        for future in as_completed(futures):
+            df[:,futures[future]] = (future.result() - fx).reshape(m)/h
+    else:
+        df = np.zeros((m, k))
+        for c in range(k):
+            df[:,c] = (f(x + deltax[:,c].reshape(x.shape)) - fx).reshape(m)/h
+    if sparsity is None: return df
+    return np.where(sparsity, df[:,colors], 0)
+
 def aNewton(
     f:Callable[[np.ndarray], np.ndarray],
     x0:np.ndarray,
     df:Callable[[np.ndarray], np.ndarray] = None,
     lesolver:Callable[[np.ndarray, np.ndarray], np.ndarray] = Gauss,
     stop:StopCondition = astopAt(),
-    showlog: bool = False) -> np.ndarray:
+    showlog: bool = False,
+    vectorized: bool = False,
+    sparsity: np.ndarray = None,
+    executor: Executor = None,
+    workers: int = None,
+    reuse: int = None,
+    rate: Number = 0.5,
+    full_output: bool = False) -> np.ndarray|tuple[np.ndarray, int, int]:
     '''解 f(x) = 0 的牛顿迭代法
     其中 x 为向量，f(x) 同样为一个向量。
-    df(x) 为 f 在 x 处的雅可比矩阵，如果 df 为 None，则使用默认的数值导数。
+    df(x) 为 f 在 x 处的雅可比矩阵，如果 df 为 None：
+     若给出 vectorized、稀疏结构 sparsity 或 executor，则用 jacobi_matrix 的相应方式计算数值导数；
+     否则若 f 能接受对偶数（见 nle__dual），则用自动微分一次调用 f 同时得到 f(x) 与雅可比矩阵；
+     否则使用 jacobi_matrix 的默认方式，每步计算 n+1 次 f。
+    f 为无法向量化的外部模拟等计算代价高的函数时，可以给出 workers，
+    在整个迭代过程中使用同一个有 workers 个进程的进程池并行计算雅可比矩阵的各列，迭代结束后关闭；
+    也可以直接传入自己管理的 executor。
+
+    给出 reuse 时使用 Shamanskii 方法（弦截法式的简化牛顿法）：
+    雅可比矩阵用 le_direct.lu 分解一次后，最多在 reuse 步中重复使用，每步只需 o(n^2) 的回代，
+    不再计算雅可比矩阵，也不使用 lesolver。
+    若某步残差的压缩比 |f(x[k+1])|/|f(x[k])| 超过 rate，下一步重新计算并分解雅可比矩阵；
+    若重复使用的分解使残差增大，则舍弃这一步，在原处重新分解后再算。
+    full_output 为 True 时返回 (x, 迭代次数, 雅可比矩阵的分解次数)，不使用 reuse 时两者相等。
     从 x0 开始迭代'''
-    n = x0.shape[0]
+    if df == None and workers is not None and executor is None:
+        with ProcessPoolExecutor(workers) as executor:
+            return aNewton(f, x0, df, lesolver, stop, showlog, vectorized, sparsity, executor,
+                           reuse=reuse, rate=rate, full_output=full_output)
+    n = np.size(x0)
+    if (df == None and sparsity is None and not vectorized and executor is None
+            and (first:=accepts_dual(f, x0, der=np.eye(n).reshape(np.shape(x0)+(n,)))) is not None):
+        def fjac(x, fx=None):
+            nonlocal first
+            if first is not None and x is x0:       #第一步在 x0 处，使用试算的结果
+                (fx, dfx), first = first, None
+                return fx, dfx.reshape(np.size(fx), n)
+            return jacobian(f, x)
+    elif df == None:
+        colors = None if sparsity is None else jacobi_coloring(sparsity)
+        def fjac(x, fx=None):
+            if fx is None: fx = f(x)
+            return fx, jacobi_matrix(f, x, fx, vectorized=vectorized, sparsity=sparsity,
+                                     colors=colors, executor=executor)
+    else:
+        def fjac(x, fx=None):
+            return (f(x) if fx is None else fx), df(x)
+    if reuse is not None:
+        return _Shamanskii(f, fjac, x0, reuse, rate, stop, showlog, full_output)
+    time = 0
+    def phi(x):
+        nonlocal time
+        time += 1
+        fx, dfx = fjac(x)
+        return x - lesolver(dfx, fx)
+    x = afpi(phi, x0, stop, showlog)
+    return (x, time, time) if full_output else x
+
+def _Shamanskii(f, fjac, x0, reuse, rate, stop, showlog, full_output):
+    '''aNewton 中重复使用雅可比矩阵 lu 分解的迭代过程'''
+    x = x0; fx = f(x); fnorm = np.linalg.norm(fx)
+    time = 0; factorizations = 0; age = 0; refresh = True
+    if showlog: print(f"开始迭代，初值为：{x.flatten()}")
+    while not stop(x, x0, time):
+        if refresh:
+            fx, dfx = fjac(x, fx)
+            factor = lu(dfx); factorizations += 1; age = 0
+        newx = x - lu_memorysave_SubstitudeBack(factor, fx)
+        newfx = f(newx); age += 1
+        theta = np.linalg.norm(newfx)/fnorm if fnorm != 0 else 0
+        if not theta < 1 and age > 1:
+            refresh = True
+            if showlog: print(f"压缩比 {theta}，舍弃这一步并重新分解雅可比矩阵")
+            continue
+        x0, x, fx, fnorm = x, newx, newfx, np.linalg.norm(newfx)
+        refresh = age >= reuse or theta > rate
+        time += 1
+        if showlog: print(f"第{time}步迭代结果：{x.flatten()}，压缩比 {theta}，已分解 {factorizations} 次")
+    return (x, time, factorizations) if full_output else x
+
+def aNewton_batch(
+    f:Callable[...,np.ndarray],
+    x0:np.ndarray,
+    df:Callable[...,np.ndarray] = None,
+    args:tuple[np.ndarray,...] = (),
+    stop:StopCondition = vstopAt(),
+    showlog:bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''批量牛顿迭代法，同时解 m 个互相独立的 n 元方程组
+    x0 的形状为 (m,n)，每行为一个方程组的初值；args 中的各参数的第一维长度为 m，按行对应各方程组。
+    f(x, *args) 对各行向量化计算，返回 (m,n)；df(x, *args) 返回雅可比矩阵，形状为 (m,n,n)。
+    df 为 None 时，若 f 能接受对偶数则用自动微分，否则用向量化的数值导数（额外计算 n 次 f）。
+    每步的 m 个线性方程组用 le_direct.Gauss_batch 一次解出，
+    stop 逐元素判断，一行全部停止（或出现 nan, inf）的方程组不再参与计算；是否收敛用 stop.converged 判断（见 iter_condition.vstopAt）。
+    返回 (x, 各方程组的迭代次数, 各方程组是否收敛)'''
+    x = np.array(x0, dtype=np.result_type(np.asarray(x0).dtype, float))
+    m, n = x.shape
+    args = tuple(np.asarray(arg) for arg in args)
+    iterations = np.zeros(m, dtype=int); converged = np.zeros(m, dtype=bool)
+    first = None
     if df == None:
-        def jacobi_matrix(x):
-            y = f(x)
-            matrix = np.zeros((n,n))
-            for i in range(n):
-                deltax = np.zeros(n)
-                deltax[i] += 1e-5
-                matrix[i,:] = (f(x + deltax) - y)*(1e5)
-            return matrix
-        df = jacobi_matrix
-    phi = lambda x: x - lesolver(df(x), f(x))
-    return afpi(phi, x0, stop, showlog)
+        if (first:=accepts_dual(f, x, *args, der=np.broadcast_to(np.eye(n), x.shape+(n,)))) is not None:
+            def fjac(x, *args):
+                fx, dfx = unpack(f(Dual(x, np.broadcast_to(np.eye(n), x.shape+(n,))), *args), n)
+                return fx, dfx
+        else:
+            def fjac(x, *args):
+                fx = f(x, *args)
+                h = 1e-5*(1 + np.abs(x))
+                dfx = np.empty(x.shape+(n,))
+                for j in range(n):
+                    dx = np.zeros(x.shape); dx[:,j] = h[:,j]
+                    dfx[:,:,j] = (f(x + dx, *args) - fx)/h[:,j,None]
+                return fx, dfx
+    else:
+        fjac = lambda x, *args: (f(x, *args), df(x, *args))
+
+    active = np.arange(m); time = 0
+    if showlog: print(f"开始批量牛顿迭代，共{m}个方程组")
+    while active.size:
+        old = x[active]
+        if first is not None: (fx, dfx), first = first, None      #第一步使用试算的结果
+        else: fx, dfx = fjac(old, *[arg[active] for arg in args])
+        new = old - Gauss_batch(dfx, fx)
+        x[active] = new
+        time += 1
+        iterations[active] = time
+        finite = np.isfinite(new).all(axis=1)
+        done = stop(new, old, time).all(axis=1) | ~finite
+        converged[active[done]] = stop.converged(new[done], old[done]).all(axis=1) & finite[done]
+        active = active[~done]
+        if showlog: print(f"第{time}步，尚有{active.size}个方程组未停止")
+    return x, iterations, converged
+
+def NewtonKrylov(
+    f:Callable[[np.ndarray], np.ndarray],
+    x0:np.ndarray,
+    stop:StopCondition = astopAt(),
+    showlog:bool = False,
+    restart:int = 20,
+    eta_max:Number = 0.9,
+    gamma:Number = 0.9,
+    alpha:Number = 2) -> np.ndarray:
+    '''解 f(x) = 0 的 Jacobian-free Newton-Krylov 方法（非精确牛顿法）
+    其中 x 为向量，f(x) 同样为一个向量。
+
+    每步的线性方程组 df(x)*dx = -f(x) 用 GMRES(restart) 求解，不需要雅可比矩阵本身，
+    只需雅可比矩阵与向量的乘积，用方向差分近似：
+     df(x)*v 约等于 (f(x + e*v) - f(x))/e,  e = sqrt(机器精度)*(1 + |x|)/|v|
+    所以每次 GMRES 内迭代只计算一次 f，内存为 O(n*restart)。
+
+    线性方程组只需解到相对残差 eta 即可，离解较远时解得精确并不能加快收敛。
+    eta 按 Eisenstat-Walker 的第二种方式调整：
+     eta = gamma*(|f(x[k])|/|f(x[k-1])|)**alpha
+    若上一步的 gamma*eta**alpha > 0.1，则 eta 不小于它，以免 eta 下降过快，并且不超过 eta_max。
+    从 x0 开始迭代'''
+    shape = x0.shape
+    x = x0.astype(float); fx = f(x); fnorm = np.linalg.norm(fx)
+    eta = eta_max; time = 0
+    sqrt_eps = np.sqrt(np.finfo(float).eps)
+    if showlog: print(f"开始迭代，初值为：{x.flatten()}")
+    while not stop(x, x0, time):
+        def jv(v):
+            vnorm = np.linalg.norm(v)
+            if vnorm == 0: return np.zeros(shape)
+            e = sqrt_eps*(1 + np.linalg.norm(x))/vnorm
+            return (f(x + e*v) - fx)/e
+        dx = GMRES(jv, -fx, rtol=eta, restart=restart)
+        x0, x = x, x + dx
+        fx = f(x)
+        newnorm = np.linalg.norm(fx)
+        if fnorm == 0: break
+        eta_new = gamma*(newnorm/fnorm)**alpha
+        if gamma*eta**alpha > 0.1: eta_new = max(eta_new, gamma*eta**alpha)
+        eta, fnorm = min(eta_max, eta_new), newnorm
+        time += 1
+        if showlog: print(f"第{time}步迭代结果：{x.flatten()}，残差 {fnorm}，eta = {eta}")
+    return x
 
 def Broyden(
     f:Callable[[np.ndarray], np.ndarray],
@@ -68,15 +326,24 @@ def Broyden(
     df0:np.ndarray = None,
     lesolver:Callable[[np.ndarray, np.ndarray], np.ndarray] = Gauss,
     stop:StopCondition = astopAt(),
-    showlog:bool = False) -> np.ndarray:
+    showlog:bool = False,
+    executor:Executor = None,
+    workers:int = None) -> np.ndarray:
     '''解 f(x) = 0 的 Broyden 方法
     其中 x 为向量，f(x) 同样为一个向量。
     df0 为 f 在 x0 处的雅可比矩阵近似值，如果没有更好的近似值，可以使用单位矩阵。
+    df0 为 None 时，若给出 executor 或 workers，则用 jacobi_matrix 并行计算 x0 处的数值导数作为 df0，
+    否则使用单位矩阵。
     本方法在迭代过程中，会逐步求出近似的雅可比矩阵。
     从 x0 开始迭代'''
     x = x0; time = 0
     n = x0.shape[0]
-    if df0 == None:
+    if df0 is None and workers is not None and executor is None:
+        with ProcessPoolExecutor(workers) as executor:
+            df0 = jacobi_matrix(f, x0, executor=executor)
+    elif df0 is None and executor is not None:
+        df0 = jacobi_matrix(f, x0, executor=executor)
+    if df0 is None:
         df0 = np.array([[
             (1 if i==j else 0)
             for i in range(n)] for j in range(n)],
@@ -97,9 +364,9 @@ def Broyden(
         f_list[1] = f_list[0]
         f_list[0] = f(x)
         df0 = df
-        df = df0 + matmul(
-            f_list[0]-f_list[1]-matmul(df, delta_list[1].reshape((n,1))),
-            delta_list[0].reshape((1,n)))/np.dot(delta_list[0], delta_list[0])
+        df = df0 - matmul(  #x - x0 = -delta_list[0]
+            f_list[0]-f_list[1]+matmul(df0, delta_list[0].reshape((n,1))),
+            delta_list[0].reshape((1,n)))/np.vdot(delta_list[0], delta_list[0])
         delta_list[1] = delta_list[0]
     return x
 
@@ -138,6 +405,58 @@ def BroydenII(
         b = b + matmul(dx - matmul(b,dfx.reshape((n,1))), dx.reshape((1,n)), b)/matmul(dx.reshape((1,n)),b,dfx.reshape(n,1))
     return x
 
+def LBroyden(
+    f:Callable[[np.ndarray], np.ndarray],
+    x0:np.ndarray,
+    m:int = 10,
+    alpha:Number = 1,
+    restart:bool = True,
+    stop:StopCondition = astopAt(),
+    showlog:bool = False) -> np.ndarray:
+    '''解 f(x) = 0 的有限内存 Broyden 方法
+    其中 x 为向量，f(x) 同样为一个向量。
+    与 Broyden 方法相同，以 alpha*单位矩阵 作为初始的雅可比矩阵近似值，
+    但不保存 n*n 的矩阵，而是由 Sherman-Morrison-Woodbury 公式直接更新雅可比矩阵的逆 h：
+     h[k+1] = h[k] + (s - h[k]*y)*s^T*h[k]/(s^T*h[k]*y),  s = x[k+1] - x[k], y = f(x[k+1]) - f(x[k])
+    从而 h = 单位矩阵/alpha + c*d^T，只需保存最近 m 步的向量 c, d 作为 n*m 矩阵的各列，
+    每步的计算量与内存都是 O(m*n)，适用于 n 很大的情形。
+    已保存 m 对向量时，restart 为 True 则全部舍弃，从单位矩阵/alpha 重新开始；否则只舍弃最早的一对。
+    舍弃在计算新的一对向量之前进行，所以更新后的 h 总满足 h*y = s；
+    但之后的各对是相对于包含最早一对的 h 计算的，restart 为 False 时 h 不再是 Broyden 方法的 h，只是其近似。
+    从 x0 开始迭代'''
+    shape = x0.shape
+    n = x0.size
+    c = np.zeros((n, m)); d = np.zeros((n, m)); k = 0
+    def h(v):       #h*v
+        return v/alpha + np.matmul(c[:,:k], np.matmul(d[:,:k].T, v))
+    def ht(v):      #h^T*v
+        return v/alpha + np.matmul(d[:,:k], np.matmul(c[:,:k].T, v))
+    x = x0; time = 0
+    fx = f(x).reshape(n)
+
+    if showlog: print(f"开始迭代，初值为：{x.flatten()}")
+    while True:
+        x0 = x
+        dx = -h(fx)
+        x = x0 + dx.reshape(shape)
+        time += 1
+        if showlog: print(f"第{time}步迭代结果：{x.flatten()}")
+
+        if stop(x, x0, time): break
+        fx0, fx = fx, f(x).reshape(n)
+        if k == m:      #先舍弃，新的一对向量要按舍弃后的 h 计算，才满足 h*y = s
+            if restart: k = 0
+            else:
+                c[:,:-1] = c[:,1:]; d[:,:-1] = d[:,1:]; k -= 1
+        hy = h(fx - fx0)
+        hs = ht(dx)
+        denominator = np.vdot(hs, fx - fx0)
+        if denominator == 0: continue
+        c[:,k] = (dx - hy)/denominator
+        d[:,k] = hs
+        k += 1
+    return x
+
 if __name__ == "__main__":
     def f(x):
         return np.array(
@@ -151,4 +470,65 @@ if __name__ == "__main__":
     x0=np.array([[1.6,],[1.2,]])
     print("牛顿迭代法")
     
-    aNewton(f=f, x0=x0, df=df, showlog=True)
\ No newline at end of file
+    aNewton(f=f, x0=x0, df=df, showlog=True)
+
+    #不动点迭代的 phi 计算次数对比，phi(x) = x + alpha*(b - a*x) 线性收敛
+    class counter:
+        def __init__(self, func): self.func = func; self.times = 0
+        def __call__(self, x): self.times += 1; return self.func(x)
+    n = 50
+    a = np.diag(np.linspace(1, 10, n)) + 0.1*np.ones((n,n))/n
+    b = np.ones((n,1))
+    for method in (afpi, aAnderson):
+        phi = counter(lambda x: x + 0.15*(b - np.matmul(a, x)))
+        x = method(phi, x0=np.zeros((n,1)), stop=astopAt(e=1e-12))
+        print(f"{method.__name__}: 残差 {np.abs(np.matmul(a, x) - b).max()}, phi 计算次数：{phi.times}")
+    #Shamanskii 方法：重复使用雅可比矩阵的 lu 分解，减少 o(n^3) 的分解次数
+    n = 200
+    rng = np.random.default_rng(0)
+    a = 4*np.eye(n) + rng.standard_normal((n,n))/np.sqrt(n)
+    g = lambda x: np.matmul(a, x) + 0.5*np.sin(x) - b[0]
+    dg = lambda x: a + np.diag(0.5*np.cos(x).flatten())
+    for reuse in (None, 3, 10):
+        x, iterations, factorizations = aNewton(g, np.zeros((n,1)), df=dg, stop=astopAt(e=1e-12),
+                                                reuse=reuse, full_output=True)
+        print(f"reuse = {reuse}: 残差 {np.abs(g(x)).max()}, 迭代 {iterations} 次，分解雅可比矩阵 {factorizations} 次")
+
+    #大规模稀疏方程组：Jacobian-free Newton-Krylov 不需要构造 n*n 的雅可比矩阵
+    n = 2000
+    def g(x):
+        y = 4*x + x**3 - 1
+        y[1:] -= x[:-1]; y[:-1] -= x[1:]
+        return y
+    g = counter(g)
+    x = NewtonKrylov(g, x0=np.zeros((n,1)), stop=astopAt(e=1e-10))
+    print(f"NewtonKrylov: n = {n}, 残差 {np.abs(g.func(x)).max()}, f 计算次数：{g.times}")
+    g.times = 0
+    x = LBroyden(g, x0=np.zeros((n,1)), m=10, alpha=4, stop=astopAt(e=1e-10))
+    print(f"LBroyden: n = {n}, 残差 {np.abs(g.func(x)).max()}, f 计算次数：{g.times}")
+
+    #非对称的弱非线性方程组，比较保存的向量对数 m 与 restart 两种舍弃方式
+    n = 200
+    a = 3*np.eye(n) + rng.standard_normal((n,n))/np.sqrt(n)
+    g = counter(lambda x: a@x + 0.3*np.sin(x) - 1)
+    for m in (3, 5):
+        for restart in (True, False):
+            g.times = 0
+            x = LBroyden(g, x0=np.zeros((n,1)), m=m, restart=restart, stop=astopAt(e=1e-10))
+            print(f"LBroyden m = {m}, restart = {restart}: 残差 {np.abs(g.func(x)).max():.1e}, f 计算次数：{g.times}")
+
+    #批量牛顿迭代法：同时解 m 个互相独立的小方程组，比逐个调用 aNewton 快得多
+    import time as _time
+    m, n = 20000, 6
+    a = 3*np.eye(n) + 0.3*rng.standard_normal((n,n))
+    c = rng.uniform(0.5, 2, (m,n))
+    h = lambda x, c: x**3 + np.matmul(x, a.T) - c
+    start = _time.perf_counter()
+    x, iterations, converged = aNewton_batch(h, np.zeros((m,n)), args=(c,))
+    elapsed = _time.perf_counter() - start
+    print(f"aNewton_batch: {m} 个 {n} 元方程组，全部收敛：{converged.all()}，"
+          f"最多迭代 {iterations.max()} 次，每秒 {m/elapsed:.0f} 个")
+    start = _time.perf_counter()
+    for i in range(200):
+        aNewton(lambda x: h(x.T, c[i:i+1]).T, np.zeros((n,1)))
+    print(f"逐个调用 aNewton：每秒 {200/(_time.perf_counter() - start):.0f} 个")
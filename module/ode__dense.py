@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+'''Runge-Kutta 方法的连续延拓（稠密输出）
+
+单步法每步只给出 x[n], x[n+1] 两个端点处的 y。若要在指定的点 t_eval 上取值，
+不必把步长缩短到恰好落在这些点上，而是在接受一步之后，用这一步内的插值多项式计算落在 [x[n], x[n+1]] 中的点：
+ 三次 Hermite 插值：由 y[n], y[n+1], f(x[n], y[n]), f(x[n+1], y[n+1]) 确定，适用于任何方法，精度 O(h^4)；
+ 方法本身的连续延拓：y(x[n]+theta*h) = y[n] + h*sum(b_i(theta)*k_i)，b_i(theta) 为 theta 的多项式，
+ 系数存放在 Butcher 表的 dense 中（见 ode_rk_tableau），比如 Dormand-Prince 方法有四阶的连续延拓。
+这样积分器可以取误差允许的最大步长，取值点的多少几乎不影响计算量。'''
+
+from numbers import Number
+import numpy as np
+
+try:
+    from .ode__typing import X,Y
+except:
+    from ode__typing import X,Y
+
+def hermite(theta:np.ndarray, h:Number, y0:Y, y1:Y, f0:Y, f1:Y) -> np.ndarray:
+    '''三次 Hermite 插值在 x[n]+theta*h 处的值，theta 的形状为 (m,)，返回 (m, *y.shape)'''
+    y0, y1, f0, f1 = (np.asarray(v) for v in (y0, y1, f0, f1))
+    theta = np.asarray(theta).reshape((-1,)+(1,)*y0.ndim)
+    dy = y1-y0
+    return y0+theta*dy+theta*(theta-1)*((1-2*theta)*dy+(theta-1)*h*f0+theta*h*f1)
+
+def interpolate(tab, theta:np.ndarray, h:Number, y0:Y, y1:Y, k:np.ndarray|list, f1:Y = None) -> np.ndarray:
+    '''Butcher 表为 tab 的方法走完一步 (x[n], y0) -> (x[n]+h, y1) 之后，x[n]+theta*h 处的值
+    k 为这一步的各级；tab 有连续延拓的系数时使用连续延拓，否则用三次 Hermite 插值，f1 = f(x[n]+h, y1)'''
+    k = np.asarray(k)
+    if tab.dense is None:
+        return hermite(theta, h, y0, y1, k[0], f1)
+    theta = np.asarray(theta, dtype=float)
+    powers = theta[:,None]**np.arange(1, tab.dense.shape[1]+1)       #(m, 次数)
+    weight = powers @ tab.dense.T                                     #(m, s)，各点处的 b_i(theta)
+    y0 = np.asarray(y0)
+    return y0+h*(weight @ k.reshape(len(k), -1)).reshape(theta.shape+y0.shape)
+
+class Sampler:
+    '''在单调递增的点 t_eval 上收集解的值
+    t_eval 需在 [x_0, max_x] 之内；每接受一步，用 fill 计算落在这一步中的点'''
+
+    def __init__(self, t_eval:np.ndarray, x_0:X, max_x:X, y_0:Y):
+        self.t = np.asarray(t_eval, dtype=float).reshape(-1)
+        if np.any(np.diff(self.t) < 0): raise ValueError("t_eval 需要单调递增")
+        if self.t.size and (self.t[0] < x_0 or self.t[-1] > max_x): raise ValueError("t_eval 需在 [x_0, max_x] 之内")
+        y_0 = np.asarray(y_0)
+        self.y = np.empty((self.t.size,)+y_0.shape, dtype=np.result_type(y_0, float))
+        self.i = 0
+
+    def pending(self, x1:X) -> bool:
+        '''还有不超过 x1 的点没有计算'''
+        return self.i < self.t.size and self.t[self.i] <= x1
+
+    def fill(self, x:X, x1:X, tab, h:Number, y0:Y, y1:Y, k:np.ndarray|list, f1:Y = None) -> None:
+        '''计算落在 [x, x1] 中的点，参数同 interpolate'''
+        j = np.searchsorted(self.t, x1, side="right")
+        self.y[self.i:j] = interpolate(tab, (self.t[self.i:j]-x)/h, h, y0, y1, k, f1)
+        self.i = j
+
+    def result(self) -> tuple[np.ndarray, np.ndarray]:
+        '''已经计算的各点（积分提前停止时，不包括停止处之后的点）'''
+        return self.t[:self.i], self.y[:self.i]
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+'''微分方程数值解的事件检测
+
+事件为 g(x, y) = 0，比如越过某个阈值、落地等。每接受一步，计算 g 在新的点上的值，
+若与上一个点异号，说明这一步内有事件发生，用 Brent 方法（见 nle_dichotomy）在这一步的插值（见 ode__dense）上求根，
+得到事件发生的位置，精度与插值相同，而不必缩短步长。
+终止事件 (terminal) 发生后不再继续积分，省去此后的计算。
+
+g 在初值处为零不算作事件；一步之内 g 变号两次（恰好回到同号）的事件检测不到，此时需要减小步长。'''
+
+from numbers import Number
+from typing import Callable
+import numpy as np
+
+try:
+    from .ode__typing import X,Y
+    from .ode__dense import interpolate
+    from .nle_dichotomy import Brent
+    from .iter_condition import stopAt
+except:
+    from ode__typing import X,Y
+    from ode__dense import interpolate
+    from nle_dichotomy import Brent
+    from iter_condition import stopAt
+
+class Event:
+    '''事件 g(x, y) = 0
+    terminal 为 True 时，事件发生后停止积分；
+    direction > 0 时只记录 g 由负变正的根，< 0 时只记录 g 由正变负的根，为 0 时都记录'''
+
+    def __init__(self, g:Callable[[X, Y], Number], terminal:bool = False, direction:Number = 0):
+        self.g, self.terminal, self.direction = g, terminal, direction
+
+class Tracker:
+    '''积分过程中检测一组事件，events 中可以是 Event，也可以直接是 g（此时为不终止、两个方向都记录的事件）'''
+
+    def __init__(self, events:list[Event|Callable], x_0:X, y_0:Y):
+        self.events = [event if isinstance(event, Event) else Event(event) for event in events]
+        self.values = [event.g(x_0, y_0) for event in self.events]
+        self.new_values = self.values
+        self.x = [[] for _ in self.events]; self.y = [[] for _ in self.events]
+
+    def _crossed(self, i:int) -> bool:
+        before, after, direction = self.values[i], self.new_values[i], self.events[i].direction
+        return (direction >= 0 and before < 0 <= after) or (direction <= 0 and before > 0 >= after)
+
+    def crossed(self, x1:X, y1:Y) -> bool:
+        '''计算 g 在一步的终点 (x1, y1) 处的值，返回这一步内是否有事件发生'''
+        self.new_values = [event.g(x1, y1) for event in self.events]
+        if any(self._crossed(i) for i in range(len(self.events))): return True
+        self.values = self.new_values
+        return False
+
+    def locate(self, x:X, x1:X, h:Number, tab, y0:Y, y1:Y, k:np.ndarray|list, f1:Y = None) -> tuple[X, Y]|None:
+        '''在 crossed 返回 True 之后，求这一步 [x, x1] 内各事件发生的位置并记录，其余参数同 ode__dense.interpolate
+        有终止事件时只记录不晚于最早的终止事件的事件，并返回终止事件的 (x, y)，否则返回 None'''
+        at = lambda xx: interpolate(tab, [(xx-x)/h], h, y0, y1, k, f1)[0]
+        roots = []
+        for i, event in enumerate(self.events):
+            if not self._crossed(i): continue
+            before, after = self.values[i], self.new_values[i]
+            #两端直接使用已知的值，以免插值的舍入误差改变符号
+            g = lambda xx: before if xx == x else after if xx == x1 else event.g(xx, at(xx))
+            roots.append((Brent(g, x, x1, stopAt(e=0, rel_e=0, max_iter=200)), i))
+        roots.sort()
+        for root, i in roots:
+            y_root = at(root)
+            self.x[i].append(root); self.y[i].append(y_root)
+            if self.events[i].terminal: return root, y_root
+        self.values = self.new_values
+        return None
+
+    def result(self) -> tuple[list[np.ndarray], list[np.ndarray]]:
+        '''各事件发生的位置 x 与对应的 y，每个事件一个 array'''
+        return [np.array(x, dtype=float) for x in self.x], [np.array(y) for y in self.y]
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+'''原地计算右端函数的各方法的公共实现
+
+y 为很长的 np.ndarray 时，y+h*f(x,y) 这样的写法每步都要分配若干个新数组。
+各方法给出 inplace=True 时，f 改为原地计算的形式 f(x, y, out)：把 y'=f(x,y) 写入 out，
+而各方法预先分配好各级的缓冲区，迭代过程中只用 out= 参数与 +=, *= 这类原地运算，
+每步不再分配新的数组（轨迹存储见 ode__trajectory，停止条件的判断除外）。
+y_0 为数时，按 0 维 np.ndarray 处理。'''
+
+from numbers import Number
+from typing import Callable
+import numpy as np
+
+try:
+    from .ode__typing import X,Y
+    from .ode__trajectory import Trajectory
+    from .iter_condition import StopCondition
+except:
+    from ode__typing import X,Y
+    from ode__trajectory import Trajectory
+    from iter_condition import StopCondition
+
+type InplaceF = Callable[[X, np.ndarray, np.ndarray], object]
+
+def state(y_0:Y) -> np.ndarray:
+    '''复制初值作为迭代过程中原地修改的 y'''
+    y_0 = np.asarray(y_0)
+    return np.array(y_0, dtype=np.result_type(y_0, float))
+
+def axpy(a:Number, x:np.ndarray, out:np.ndarray, tmp:np.ndarray) -> None:
+    '''out += a*x，tmp 为与 x 形状相同的缓冲区'''
+    np.multiply(x, a, out=tmp)
+    out += tmp
+
+def combine(out:np.ndarray, y:np.ndarray, coef:list[Number], k:list[np.ndarray], tmp:np.ndarray) -> None:
+    '''out = y + sum(coef[i]*k[i])'''
+    out[...] = y
+    for i in range(len(coef)):
+        if coef[i] != 0: axpy(coef[i], k[i], out, tmp)
+
+def rk(
+    f:InplaceF, trajectory:Trajectory,
+    x:X, y:np.ndarray,
+    h:Number, max_x:Number,
+    a:list[Number], b:list[list[Number]], c:list[Number]
+    ) -> tuple[np.ndarray,np.ndarray]:
+    '''定步长显式 Runge-Kutta 方法
+    k_1 = f(x, y), k_i = f(x+h*a[i-2], y+h*sum(b[i-2][j]*k_j)), y[n+1] = y[n] + h*sum(c[i]*k_i)
+    由参数构造 Butcher 表，交给 ode_rk_tableau 中的通用实现计算（同样只用原地运算），
+    得到的各点接在 trajectory 已有的点之后'''
+    try: from .ode_rk_tableau import RungeKutta, tableau
+    except: from ode_rk_tableau import RungeKutta, tableau
+    xs, ys = RungeKutta(f, x, y, h, max_x, tableau([0, *a], b, c), inplace=True)
+    for i in range(1, len(xs)):
+        trajectory.append(xs[i], ys[i])
+    return trajectory.result()
+
+def history(f:InplaceF, x_init:list[X], y_init:list[Y], k:int) -> list[np.ndarray]:
+    '''多步法所需的 f 在已知点上的值，按时间先后排列，最后一个缓冲区留给当前点'''
+    y = state(y_init[-1])
+    dy = [np.empty_like(y) for _ in range(k)]
+    for i in range(1, k):
+        f(x_init[i-k-1], state(y_init[i-k-1]), dy[i-1])
+    return dy
+
+def multistep(
+    f:InplaceF, trajectory:Trajectory,
+    x:X, y:np.ndarray, dy:list[np.ndarray],
+    h:Number, max_x:Number,
+    weight:list[Number]
+    ) -> tuple[np.ndarray,np.ndarray]:
+    '''定步长显式线性多步法 y[n+1] = y[n] + h*sum(weight[i]*f(x[n-i], y[n-i]))
+    dy 由 history 得到'''
+    hw = [h*w for w in weight]
+    tmp = np.empty_like(y)
+    while x < max_x:
+        f(x, y, dy[-1])
+        for i in range(len(hw)):
+            axpy(hw[i], dy[-i-1], y, tmp)
+        x = x+h
+        trajectory.append(x, y)
+        dy.append(dy.pop(0))
+    return trajectory.result()
+
+def implicit(
+    f:InplaceF, trajectory:Trajectory,
+    x:X, y:np.ndarray, dy:list[np.ndarray],
+    h:Number, max_x:Number,
+    beta:Number, weight:list[Number],
+    stop:StopCondition
+    ) -> tuple[np.ndarray,np.ndarray]:
+    '''定步长隐式线性多步法
+    y[n+1] = y[n] + h*beta*f(x[n+1], y[n+1]) + h*sum(weight[i]*f(x[n-i], y[n-i]))
+    用不动点迭代求解 y[n+1]，dy 由 history 得到（weight 为空时为空列表）'''
+    hw = [h*w for w in weight]; hbeta = h*beta
+    known = np.empty_like(y); newy = np.empty_like(y); lasty = np.zeros_like(y)
+    fy = np.empty_like(y); tmp = np.empty_like(y)
+    while x < max_x:
+        if dy: f(x, y, dy[-1])
+        combine(known, y, hw, dy[::-1], tmp)
+        x = x+h
+        newy[...] = y; lasty[...] = 0
+        times = 0
+        while not stop(lasty, newy, times):
+            lasty[...] = newy
+            f(x, lasty, fy)
+            np.multiply(fy, hbeta, out=newy)
+            newy += known
+            times += 1
+        y[...] = newy
+        trajectory.append(x, y)
+        if dy: dy.append(dy.pop(0))
+    return trajectory.result()
@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+'''隐式方法的简化牛顿校正
+
+隐式欧拉、梯形方法、Adams内插公式等每步都要解
+ z = known + h*beta*f(x[n+1], z),  known = y[n] + h*sum(weight[i]*f(x[n-i], y[n-i]))
+不动点迭代只在 h*beta*|df/dy| < 1 时收敛，对刚性问题就要求步长很小，失去了隐式方法的意义。
+这里改用牛顿迭代：z <- z - M^(-1)*(z - known - h*beta*f(x[n+1], z)),  M = I - h*beta*J，J 为 df/dy。
+定步长时 M 只随 J 变化，因此只在需要时重新计算 J 并作 lu 分解（le_direct.lu），
+同一个分解在以后的各步中反复使用（简化牛顿法），直到收敛变慢：
+相邻两次修正量之比（压缩比）超过 rate 时，下一步重新计算；压缩比不小于 1 时，立即重新计算并重做这一步。
+J 由 df(x, y) 给出，未给出时用差商计算（额外计算 d 次 f）。
+收敛后 f(x[n+1], y[n+1]) 直接由方程取 (z - known)/(h*beta)，下一步的 sum 中不必再计算一次 f；
+对刚性问题这样也比重新计算 f 更好，重新计算会把牛顿法剩下的误差按 |J| 放大。'''
+
+from numbers import Number
+from typing import Callable
+import numpy as np
+
+try:
+    from .ode__typing import X,Y
+    from .ode__trajectory import Trajectory
+    from .iter_condition import StopCondition
+    from .le_direct import lu, lu_memorysave_SubstitudeBack
+    from . import ode__inplace
+except:
+    from ode__typing import X,Y
+    from ode__trajectory import Trajectory
+    from iter_condition import StopCondition
+    from le_direct import lu, lu_memorysave_SubstitudeBack
+    import ode__inplace
+
+def evaluate(f:Callable, x:X, y:np.ndarray, inplace:bool) -> np.ndarray:
+    '''f(x, y)，inplace 为 True 时 f 为原地计算的形式 f(x, y, out)'''
+    if not inplace: return np.asarray(f(x, y), dtype=y.dtype)
+    out = np.empty_like(y)
+    f(x, y, out)
+    return out
+
+def jacobian(f:Callable, x:X, y:np.ndarray, fy:np.ndarray, inplace:bool) -> np.ndarray:
+    '''df/dy 的差商近似，返回 (d, d)，d 为 y 的元素个数'''
+    d = y.size
+    step = np.sqrt(np.finfo(float).eps)*np.maximum(np.abs(y.reshape(-1)), 1)
+    J = np.empty((d, d))
+    for j in range(d):
+        shifted = y.copy()
+        shifted.reshape(-1)[j] += step[j]
+        J[:,j] = (evaluate(f, x, shifted, inplace)-fy).reshape(-1)/step[j]
+    return J
+
+def implicit(
+    f:Callable, trajectory:Trajectory,
+    x_init:list[X], y_init:list[Y],
+    h:Number, max_x:Number,
+    beta:Number, weight:list[Number],
+    stop:StopCondition,
+    df:Callable[[X, Y], np.ndarray] = None,
+    rate:Number = 0.5,
+    inplace:bool = False
+    ) -> tuple[np.ndarray,np.ndarray]:
+    '''定步长隐式线性多步法，用简化牛顿法求解每步的 y[n+1]
+    y[n+1] = y[n] + h*beta*f(x[n+1], y[n+1]) + h*sum(weight[i]*f(x[n-i], y[n-i]))
+    x_init, y_init 为已知的点，至少 len(weight) 个；df(x, y) 返回 (d, d) 的雅可比矩阵，None 时用差商'''
+    x = x_init[-1]; y = ode__inplace.state(y_init[-1])
+    shape = y.shape; d = y.size
+    hw = [h*w for w in weight]; hbeta = h*beta
+    dy = [evaluate(f, x_init[i], ode__inplace.state(y_init[i]), inplace) for i in range(-len(weight), -1)] + [None]
+    factor = None; refresh = True
+    fy = None           #f(x, y)，第一步之后由上一步的方程得到
+    while x < max_x:
+        if weight: dy[-1] = evaluate(f, x, y, inplace) if fy is None else fy
+        known = y + sum(hw[i]*dy[-i-1] for i in range(len(hw)))
+        x = x+h
+        z = y.copy(); times = 0; fresh = slow = False; last_norm = None
+        while True:
+            if refresh:
+                if df is None: J = jacobian(f, x, z, evaluate(f, x, z, inplace), inplace)
+                else: J = np.asarray(df(x, z), dtype=float).reshape(d, d)
+                factor = lu(np.eye(d) - hbeta*J)
+                refresh = False; fresh = True
+            residual = z - known - hbeta*evaluate(f, x, z, inplace)
+            newz = z - lu_memorysave_SubstitudeBack(factor, residual.reshape(d, 1)).reshape(shape)
+            norm = np.max(np.abs(newz - z))
+            if last_norm is not None and last_norm != 0:
+                theta = norm/last_norm
+                if theta >= 1 and not fresh:        #旧的分解不再适用，重新计算并重做这一步
+                    refresh = True; z = y.copy(); times = 0; last_norm = None
+                    continue
+                if theta > rate: slow = True        #收敛变慢，下一步重新计算
+            last_z, z, last_norm = z, newz, norm
+            times += 1
+            if stop(last_z, z, times): break
+        y = z; refresh = slow
+        if weight: fy = (z - known)/hbeta
+        trajectory.append(x, y)
+        if weight: dy.append(dy.pop(0))
+    return trajectory.result()
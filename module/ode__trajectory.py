@@ -0,0 +1,57 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+'''微分方程数值解的轨迹存储
+
+各方法每步得到一个 (x, y)，如果用 list.append 保存，每个 Python 浮点数都是单独的对象，
+一步约占 60 字节。这里预先分配连续的 float64 数组，一步只占 16 字节（y 为数时）；
+定步长方法可以由 (max_x-x_0)/h 估计步数一次分配完，变步长方法则在用完时按倍数扩大。
+最后返回数组的视图，不再复制。'''
+
+import math
+from numbers import Number
+import numpy as np
+
+try: from .ode__typing import X, Y
+except: from ode__typing import X, Y
+
+def steps(x_0:X, max_x:X, h:Number) -> int:
+    '''定步长方法从 x_0 迭代至 x >= max_x 所需的步数（多估计一步以容纳舍入误差）'''
+    return max(0, math.ceil((max_x - x_0)/h)) + 1
+
+class Trajectory:
+    '''预分配的轨迹存储
+    x_init, y_init 为已知的点（单步法只有初值一个点，多步法有多个初值点），
+    capacity 为预计还要加入的点数，不足时自动扩大为原来的两倍。
+    y 可以是数，也可以是 np.ndarray，此时 self.y 的每一行为一个点的 y'''
+
+    def __init__(self, x_init:list[X], y_init:list[Y], capacity:int = 0):
+        n = len(x_init)
+        capacity = max(n + capacity, 16)
+        y_0 = np.asarray(y_init[0])
+        self.x = np.empty(capacity, dtype=np.result_type(*x_init, float))
+        self.y = np.empty((capacity,)+y_0.shape, dtype=np.result_type(y_0, float))
+        self.x[:n] = x_init
+        for i in range(n): self.y[i] = y_init[i]
+        self.size = n
+
+    def append(self, x:X, y:Y) -> None:
+        if self.size == len(self.x): self.grow()
+        self.x[self.size] = x
+        self.y[self.size] = y
+        self.size += 1
+
+    def grow(self) -> None:
+        '''容量扩大为原来的两倍'''
+        x = np.empty(2*len(self.x), dtype=self.x.dtype)
+        y = np.empty((2*len(self.y),)+self.y.shape[1:], dtype=self.y.dtype)
+        x[:self.size] = self.x[:self.size]
+        y[:self.size] = self.y[:self.size]
+        self.x, self.y = x, y
+
+    def __len__(self) -> int:
+        return self.size
+
+    def result(self) -> tuple[np.ndarray, np.ndarray]:
+        '''返回 (x, y) 两个数组，是存储空间的视图而非副本'''
+        return self.x[:self.size], self.y[:self.size]
@@ -2,14 +2,16 @@
 # -*- coding: utf-8 -*-
 
 from numbers import Number
+import numpy as np
 
 type U = Number
 type U0 = Number; type U1 = Number; type U2 = Number; type U3 = Number; type U4 = Number
 type U5 = Number; type U6 = Number; type U7 = Number; type U8 = Number; type U9 = Number
 
-type Y = Number
-type Y0 = Number; type Y1 = Number; type Y2 = Number; type Y3 = Number; type Y4 = Number
-type Y5 = Number; type Y6 = Number; type Y7 = Number; type Y8 = Number; type Y9 = Number
+#y 可以是数，也可以是表示方程组的 np.ndarray
+type Y = Number|np.ndarray
+type Y0 = Y; type Y1 = Y; type Y2 = Y; type Y3 = Y; type Y4 = Y
+type Y5 = Y; type Y6 = Y; type Y7 = Y; type Y8 = Y; type Y9 = Y
 
 type T = Number
 type T0 = Number; type T1 = Number; type T2 = Number; type T3 = Number; type T4 = Number
@@ -0,0 +1,275 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from numbers import Number
+from typing import Callable
+import numpy as np
+
+try:
+    from .ode__typing import X,Y
+    from .ode__trajectory import Trajectory
+    from .le_direct import lu, lu_memorysave_SubstitudeBack
+    from .le_direct_specialmat import band, band_lu, band_SubstitudeBack
+except:
+    from ode__typing import X,Y
+    from ode__trajectory import Trajectory
+    from le_direct import lu, lu_memorysave_SubstitudeBack
+    from le_direct_specialmat import band, band_lu, band_SubstitudeBack
+
+#y'=f(x,y)
+
+'''变阶变步长的向后差分公式 (Backward Differentiation Formula, BDF)
+
+k 阶 BDF 用 y[n+1], y[n], ..., y[n+1-k] 的 k 阶向后差分近似 h*y'[n+1]：
+ sum(1/j * nabla^j y[n+1], j = 1..k) = h*f(x[n+1], y[n+1])
+1~2 阶为 A 稳定，3~5 阶为 A(alpha) 稳定（6 阶以上不再稳定），适合刚性问题。
+这里采用 Klopfenstein-Shampine 的 NDF 形式（固定首项系数），在上式左边加上 kappa*gamma_k*(y[n+1] - y预测)，
+误差常数更小而稳定性几乎不变。
+
+向后差分存放在 D 中（D[j] = nabla^j y[n]），改变步长时对 D 作线性变换，相当于在新的等距网格上重新插值，
+因此步长可以在各步之间任意改变。每步：
+ 1. 由 D 外推得到预测值，用牛顿法解出 y[n+1]，迭代矩阵为 I - c*J（c = h/alpha_k），
+    J 只在牛顿法不收敛时重新计算，lu 分解只在 c 改变（即步长或阶数改变，包括被拒绝后缩短步长）时重做；
+ 2. 局部误差估计为 error_const_k * (y[n+1] - y预测)，超过容许误差则缩短步长重算；
+ 3. 连续 k+1 步步长不变之后，比较 k-1, k, k+1 阶的误差估计，选出允许步长最大的阶数与相应的步长。
+容许误差为 max_error + rel_error*|y|（逐分量），误差取各分量与容许误差之比的均方根。
+
+雅可比矩阵由 df(x, y) 给出，未给出时用差商计算；给出 band = (l, u) 时雅可比矩阵为带状矩阵，
+差商只需 l+u+1 次 f（同时扰动互不影响的各列），线性方程组用 le_direct_specialmat 中的带状 lu 分解求解。'''
+
+MAX_ORDER = 5
+NEWTON_MAXITER = 4
+MIN_FACTOR = 0.2
+MAX_FACTOR = 10
+
+#NDF 的系数，kappa 为 0 时即为 BDF
+kappa = np.array([0, -0.1850, -1/9, -0.0823, -0.0415, 0])
+gamma = np.hstack((0, np.cumsum(1/np.arange(1, MAX_ORDER+1))))
+alpha = (1-kappa)*gamma
+error_const = kappa*gamma + 1/np.arange(1, MAX_ORDER+2)
+
+def _rms(x:np.ndarray) -> float:
+    return np.linalg.norm(x)/np.sqrt(x.size)
+
+def _compute_R(order:int, factor:Number) -> np.ndarray:
+    '''步长变为 factor 倍时，向后差分的变换矩阵'''
+    I = np.arange(1, order+1)[:,None]
+    J = np.arange(1, order+1)
+    M = np.zeros((order+1, order+1))
+    M[1:,1:] = (I-1-factor*J)/I
+    M[0] = 1
+    return np.cumprod(M, axis=0)
+
+def change_D(D:np.ndarray, order:int, factor:Number) -> None:
+    '''步长变为 factor 倍，原地修改向后差分 D'''
+    RU = _compute_R(order, factor) @ _compute_R(order, 1)
+    D[:order+1] = RU.T @ D[:order+1]
+
+def initial_step(
+    fun:Callable[[X, np.ndarray], np.ndarray], x:X, y:np.ndarray, fy:np.ndarray,
+    max_x:Number, max_error:Number, rel_error:Number) -> Number:
+    '''由 f 与其变化率估计初始步长，使一阶方法的局部误差与容许误差相当，y, fy 为一维数组'''
+    scale = max_error + rel_error*np.abs(y)
+    d0, d1 = _rms(y/scale), _rms(fy/scale)
+    h0 = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01*d0/d1
+    h0 = min(h0, max_x-x)
+    d2 = _rms((fun(x+h0, y+h0*fy)-fy)/scale)/h0
+    if d1 <= 1e-15 and d2 <= 1e-15: h1 = max(1e-6, h0*1e-3)
+    else: h1 = (0.01/max(d1, d2))**(1/2)
+    return min(100*h0, h1, max_x-x)
+
+class BDFSolver:
+    '''逐步推进的变阶变步长 BDF 方法，见模块说明
+    用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0，积分至 max_x 为止
+    init_h 为 None 时自动选取初始步长；max_order 为最高阶数（1~5），超出范围时抛出 ValueError
+    x, y 为当前的点，order, h 为当前的阶数与步长；
+    accepted, rejected, evaluations, jacobians, factorizations 分别为接受、拒绝的步数，f、雅可比矩阵的计算次数与 lu 分解的次数'''
+
+    def __init__(
+        self, f:Callable[[X, Y], Y],
+        x_0:X, y_0:Y, max_x:Number,
+        max_error:Number = 1e-6, rel_error:Number = 1e-3,
+        init_h:Number = None,
+        df:Callable[[X, Y], np.ndarray] = None,
+        band:tuple[int, int] = None,
+        max_order:int = MAX_ORDER):
+        if not 1 <= max_order <= MAX_ORDER: raise ValueError(f"max_order 需要在 1~{MAX_ORDER} 之间")
+        self.f, self.df, self.band = f, df, band
+        self.shape = np.shape(y_0)
+        self.x = x_0; self.y = np.array(y_0, dtype=float).reshape(-1)
+        self.max_x = max_x
+        self.max_error, self.rel_error = max_error, rel_error
+        self.max_order = max_order
+        self.accepted = self.rejected = self.evaluations = self.jacobians = self.factorizations = 0
+        #牛顿法的收敛精度（相对于容许误差）
+        self.newton_tol = max(10*np.finfo(float).eps/rel_error, min(0.03, rel_error**0.5)) if rel_error > 0 else 0.03
+        fy = self.fun(x_0, self.y)
+        self.h = initial_step(self.fun, x_0, self.y, fy, max_x, max_error, rel_error) if init_h is None else min(init_h, max_x-x_0)
+        self.D = np.zeros((MAX_ORDER+3, self.y.size))
+        self.D[0] = self.y; self.D[1] = fy*self.h
+        self.order = 1; self.equal_steps = 0
+        self.J = self.jacobian(x_0, self.y, fy); self.LU = None
+
+    def fun(self, x:X, y:np.ndarray) -> np.ndarray:
+        self.evaluations += 1
+        return np.asarray(self.f(x, y.reshape(self.shape)), dtype=float).reshape(-1)
+
+    def jacobian(self, x:X, y:np.ndarray, fy:np.ndarray) -> np.ndarray:
+        '''雅可比矩阵：普通的 (n, n) 矩阵，给出 band 时为 le_direct_specialmat 中的带状存储'''
+        self.jacobians += 1
+        if self.df is not None:
+            J = np.asarray(self.df(x, y.reshape(self.shape)), dtype=float).reshape(y.size, y.size)
+            return J if self.band is None else band(J, *self.band)
+        n = y.size
+        #差商的步长与 y 的量级相当（不小于绝对误差 max_error），y 的分量很小时也不致淹没其变化
+        step = np.sqrt(np.finfo(float).eps)*np.maximum(np.abs(y), self.max_error if self.max_error > 0 else 1)
+        if self.band is None:
+            J = np.empty((n, n))
+            for j in range(n):
+                shifted = y.copy(); shifted[j] += step[j]
+                J[:,j] = (self.fun(x, shifted)-fy)/step[j]
+            return J
+        l, u = self.band
+        J = np.zeros((n, l+u+1))
+        for group in range(min(l+u+1, n)):  #相距 l+u+1 列的各列影响的行互不重叠，可以同时扰动
+            columns = np.arange(group, n, l+u+1)
+            shifted = y.copy(); shifted[columns] += step[columns]
+            diff = self.fun(x, shifted)-fy
+            for j in columns:
+                rows = np.arange(max(0, j-u), min(n, j+l+1))
+                J[rows, j-rows+l] = diff[rows]/step[j]
+        return J
+
+    def factor(self, c:Number):
+        '''迭代矩阵 I - c*J 的 lu 分解'''
+        self.factorizations += 1
+        if self.band is None:
+            return lu(np.eye(self.y.size) - c*self.J)
+        l, u = self.band
+        matrix = -c*self.J; matrix[:,l] += 1
+        return band_lu(matrix, l, u)
+
+    def solve(self, LU, b:np.ndarray) -> np.ndarray:
+        if self.band is None:
+            return lu_memorysave_SubstitudeBack(LU, b.reshape(-1, 1)).reshape(-1)
+        return band_SubstitudeBack(LU, b)
+
+    def newton(self, x:X, y_predict:np.ndarray, c:Number, psi:np.ndarray, scale:np.ndarray):
+        '''解 y - c*f(x, y) = y_predict - c*psi（NDF 的方程），返回 (是否收敛, 迭代次数, y, y-y_predict)'''
+        d = np.zeros_like(y_predict); y = y_predict.copy()
+        last_norm = None
+        for k in range(NEWTON_MAXITER):
+            fy = self.fun(x, y)
+            if not np.all(np.isfinite(fy)): break
+            dy = self.solve(self.LU, c*fy-psi-d)
+            norm = _rms(dy/scale)
+            rate = None if last_norm is None else norm/last_norm
+            #收敛太慢，剩下的迭代次数内无法达到精度
+            if rate is not None and (rate >= 1 or rate**(NEWTON_MAXITER-k)/(1-rate)*norm > self.newton_tol): break
+            y += dy; d += dy
+            if norm == 0 or (rate is not None and rate/(1-rate)*norm < self.newton_tol):
+                return True, k+1, y, d
+            last_norm = norm
+        return False, k+1, y, d
+
+    def resize(self, factor:Number) -> None:
+        '''步长变为 factor 倍'''
+        self.h *= factor
+        change_D(self.D, self.order, factor)
+        self.equal_steps = 0; self.LU = None
+
+    def step(self) -> None:
+        '''推进一步（包括被拒绝后的重算），步长小到无法推进 x 时抛出 RuntimeError'''
+        D, order = self.D, self.order
+        fresh = False       #J 是否在这一步重新计算过
+        min_h = 10*abs(np.nextafter(self.x, np.inf)-self.x)
+        while True:
+            if self.h < min_h:
+                raise RuntimeError(f"步长过小，在 x = {self.x} 处无法继续")
+            if self.x+self.h > self.max_x:
+                self.resize((self.max_x-self.x)/self.h)
+            new_x = self.x+self.h if self.x+self.h < self.max_x else self.max_x
+            y_predict = np.sum(D[:order+1], axis=0)
+            scale = self.max_error + self.rel_error*np.abs(y_predict)
+            psi = D[1:order+1].T @ gamma[1:order+1]/alpha[order]
+            c = self.h/alpha[order]
+            while True:
+                if self.LU is None: self.LU = self.factor(c)
+                converged, iterations, y_new, d = self.newton(new_x, y_predict, c, psi, scale)
+                if converged or fresh: break
+                #牛顿法不收敛，先重新计算雅可比矩阵，仍不收敛再缩短步长
+                self.J = self.jacobian(new_x, y_predict, self.fun(new_x, y_predict)); self.LU = None
+                fresh = True
+            if not converged:
+                self.rejected += 1
+                self.resize(0.5)
+                continue
+            safety = 0.9*(2*NEWTON_MAXITER+1)/(2*NEWTON_MAXITER+iterations)
+            scale = self.max_error + self.rel_error*np.abs(y_new)
+            error_norm = _rms(error_const[order]*d/scale)
+            if error_norm > 1:
+                self.rejected += 1
+                self.resize(max(MIN_FACTOR, safety*error_norm**(-1/(order+1))))
+                continue
+            break
+        self.accepted += 1; self.equal_steps += 1
+        self.x, self.y = new_x, y_new
+        #更新向后差分
+        D[order+2] = d-D[order+1]
+        D[order+1] = d
+        for i in reversed(range(order+1)):
+            D[i] += D[i+1]
+        if self.equal_steps < order+1: return
+        #连续 order+1 步步长不变，比较相邻阶数的误差估计，选择阶数与步长
+        error_m = _rms(error_const[order-1]*D[order]/scale) if order > 1 else np.inf
+        error_p = _rms(error_const[order+1]*D[order+2]/scale) if order < self.max_order else np.inf
+        with np.errstate(divide="ignore"):
+            factors = np.array([error_m, error_norm, error_p])**(-1/np.arange(order, order+3))
+        self.order = order+int(np.argmax(factors))-1
+        self.resize(min(MAX_FACTOR, safety*np.max(factors)))
+
+def BDF(
+    f:Callable[[X, Y], Y],
+    x_0:X, y_0:Y, max_x:Number,
+    max_error:Number = 1e-6, rel_error:Number = 1e-3,
+    init_h:Number = None,
+    df:Callable[[X, Y], np.ndarray] = None,
+    band:tuple[int, int] = None,
+    max_order:int = MAX_ORDER,
+    full_output:bool = False
+    ) -> tuple[np.ndarray,np.ndarray]|tuple[np.ndarray,np.ndarray,int,int,int,int,int]:
+    '''变阶变步长的 BDF 方法（NDF 形式），用于刚性问题，见模块说明
+    用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
+    迭代至 x = max_x 为止，每步的局部误差估计不超过 max_error + rel_error*|y|（逐分量，取均方根）
+    df(x, y) 返回雅可比矩阵 (n, n)，None 时用差商；band = (l, u) 时雅可比矩阵为下带宽 l、上带宽 u 的带状矩阵
+    full_output 为 True 时额外返回接受的步数、拒绝的步数，f、雅可比矩阵的计算次数与 lu 分解的次数'''
+    solver = BDFSolver(f, x_0, y_0, max_x, max_error, rel_error, init_h, df, band, max_order)
+    trajectory = Trajectory([x_0], [y_0])
+    while solver.x < max_x:
+        solver.step()
+        trajectory.append(solver.x, solver.y.reshape(solver.shape))
+    x, y = trajectory.result()
+    if full_output:
+        return x, y, solver.accepted, solver.rejected, solver.evaluations, solver.jacobians, solver.factorizations
+    return x, y
+
+if __name__ == "__main__":
+    #Robertson 化学反应动力学，三个反应的速率相差 10^9 倍，步长从 1e-6 增长到 1e10 左右
+    def robertson(x, y):
+        return np.array([-0.04*y[0] + 1e4*y[1]*y[2],
+                         0.04*y[0] - 1e4*y[1]*y[2] - 3e7*y[1]**2,
+                         3e7*y[1]**2])
+    x, y, accepted, rejected, evaluations, jacobians, factorizations = BDF(
+        robertson, 0, np.array([1., 0, 0]), 1e11, max_error=1e-10, rel_error=1e-6, full_output=True)
+    h = np.diff(x)
+    print(f"Robertson：积分到 {x[-1]:.0e}，步长从 {h.min():.1e} 到 {h.max():.1e}，y = {y[-1]}，y 之和 - 1 = {y[-1].sum()-1:.1e}")
+    print(f"接受 {accepted} 步，拒绝 {rejected} 步，f 的计算次数 {evaluations}，雅可比矩阵 {jacobians} 次，lu 分解 {factorizations} 次")
+
+    #一维热方程 u_t = u_xx 的差分离散化，雅可比矩阵为三对角矩阵
+    n = 200; dx = 1/(n+1)
+    grid = np.linspace(dx, 1-dx, n)
+    heat = lambda x, u: (np.concatenate(([0], u[:-1])) - 2*u + np.concatenate((u[1:], [0])))/dx**2
+    for b in (None, (1, 1)):
+        x, u, accepted, rejected, evaluations, jacobians, factorizations = BDF(
+            heat, 0, np.sin(np.pi*grid), 0.5, rel_error=1e-5, band=b, full_output=True)
+        print(f"热方程 band = {b}：{accepted} 步，f 的计算次数 {evaluations}，"
+              f"误差 {np.max(np.abs(u[-1]-np.exp(-np.pi**2*0.5)*np.sin(np.pi*grid))):.1e}")
@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from numbers import Number
+from typing import Callable
+import numpy as np
+
+try:
+    from .ode__typing import X
+    from .ode__trajectory import Trajectory, steps
+    from .ode_rk_tableau import ButcherTableau, DP
+except:
+    from ode__typing import X
+    from ode__trajectory import Trajectory, steps
+    from ode_rk_tableau import ButcherTableau, DP
+
+#y'=f(x,y)
+
+'''系综积分：同一个微分方程的 m 组初值（以及参数）一起计算
+
+逐个调用 r4RungeKutta 等方法时，m 很大则时间主要花在 Python 解释器上。
+这里把 m 组初值叠成形状为 (m, d) 的 y_0，f(x, y, *args) 对各行向量化计算，
+每步的各级只调用一次 f，计算时间随数组宽度增长，而与 m 的大小基本无关。
+args 中的各参数的第一维长度为 m，按行对应各成员，比如每个成员不同的方程参数。'''
+
+def _ensemble(y_0, args) -> tuple[np.ndarray, tuple[np.ndarray,...]]:
+    y_0 = np.asarray(y_0)
+    return np.array(y_0, dtype=np.result_type(y_0, float)), tuple(np.asarray(arg) for arg in args)
+
+def Ensemble_RungeKutta(
+    f:Callable[..., np.ndarray],
+    x_0:X, y_0:np.ndarray,
+    h:Number, max_x:Number,
+    args:tuple[np.ndarray,...] = (),
+    save:bool = True
+    ) -> tuple[np.ndarray,np.ndarray]:
+    '''系综的经典Runge-Kutta法
+    各成员共用步长 h 与 x，f(x, y, *args) 中的 x 为数，y 的形状为 (m, d)
+    迭代至 x >= max_x 为止，精度 O(h^4)
+    save 为 True 时返回整条轨迹，y 的形状为 (步数, m, d)；否则只返回最后的 (x, y)'''
+    y, args = _ensemble(y_0, args)
+    if save: trajectory = Trajectory([x_0], [y], steps(x_0, max_x, h))
+    x = x_0; h2 = h/2; h6 = h/6
+    while x < max_x:
+        k1 = f(x, y, *args)
+        k2 = f(x+h2, y+h2*k1, *args)
+        k3 = f(x+h2, y+h2*k2, *args)
+        k4 = f(x+h, y+h*k3, *args)
+        y = y+h6*(k1+2*k2+2*k3+k4)
+        x = x+h
+        if save: trajectory.append(x, y)
+    return trajectory.result() if save else (x, y)
+
+def Ensemble_VariableStepSize_RungeKutta(
+    f:Callable[..., np.ndarray],
+    x_0:X, y_0:np.ndarray,
+    init_h:Number, max_x:Number,
+    max_error:Number,
+    arg:ButcherTableau = DP,
+    args:tuple[np.ndarray,...] = (),
+    full_output:bool = False
+    ) -> tuple[np.ndarray,np.ndarray]|tuple[np.ndarray,np.ndarray,np.ndarray,np.ndarray]:
+    '''系综的变步长Runge-Kutta法，arg 为嵌入式方法的 Butcher 表，见 ode_rk_tableau
+    每个成员有各自的 x 与步长，f(x, y, *args) 中的 x 为形状 (m,) 的 array，y 的形状为 (m, d)
+    每步对尚未到达 max_x 的成员一起计算，局部误差估计（各分量绝对值的最大值）不超过 max_error 的成员接受这一步，
+    其余成员拒绝这一步；然后各成员按 0.9*(max_error/error)**(1/5) 调整步长（限制在 0.2 倍到 5 倍之间，
+    指数 1/5 对应四阶的误差估计，一般为 1/(min(order, order_hat)+1)）。
+    FSAL 的方法（如 DP）各成员保存最后一级，作为下一步的第一级；被拒绝的成员 x, y 不变，第一级也可以重复使用。
+    最后一步缩短到恰好落在 max_x 上，返回各成员在 max_x 处的 (x, y)；
+    步长小到无法推进 x 的成员提前停止，其 x 小于 max_x。
+    full_output 为 True 时额外返回各成员接受、拒绝的步数'''
+    y, args = _ensemble(y_0, args)
+    m = y.shape[0]
+    x = np.full(m, x_0, dtype=float); h = np.full(m, init_h, dtype=float)
+    accepted = np.zeros(m, dtype=int); rejected = np.zeros(m, dtype=int)
+    s = arg.stages; fsal = arg.fsal
+    power = 1/(min(arg.order, arg.order_hat)+1)
+    if fsal: first = f(x, y, *args)     #各成员当前点的 f(x, y)
+    active = np.arange(m)
+    while active.size:
+        xa, ya = x[active], y[active]
+        ha = np.minimum(h[active], max_x-xa)
+        aa = tuple(arg_[active] for arg_ in args)
+        hb = ha.reshape((-1,)+(1,)*(y.ndim-1))
+        k = np.empty((s,)+ya.shape, dtype=y.dtype)
+        k[0] = first[active] if fsal else f(xa, ya, *aa)
+        for i in range(1, s):
+            k[i] = f(xa+ha*arg.c[i], ya+hb*np.tensordot(arg.a[i,:i], k[:i], 1), *aa)
+        newy = ya+hb*np.tensordot(arg.b, k, 1)
+        error = np.abs(hb*np.tensordot(arg.e, k, 1)).reshape(active.size, -1).max(axis=1)
+        error = np.where(np.isfinite(error), error, np.inf)
+        ok = error <= max_error
+        x[active[ok]] = xa[ok]+ha[ok]
+        y[active[ok]] = newy[ok]
+        if fsal: first[active[ok]] = k[-1][ok]
+        accepted[active[ok]] += 1; rejected[active[~ok]] += 1
+        with np.errstate(divide="ignore"):
+            h[active] = ha*np.clip(0.9*(max_error/error)**power, 0.2, 5)
+        active = active[(x[active] < max_x) & (x[active]+h[active] > x[active])]
+    return (x, y, accepted, rejected) if full_output else (x, y)
+
+if __name__ == "__main__":
+    import time
+    try: from .ode_rk import r4RungeKutta
+    except: from ode_rk import r4RungeKutta
+
+    #阻尼振子 y'' + c*y' + y = 0，每个成员的初值与阻尼系数 c 都不同
+    m = 100000
+    rng = np.random.default_rng(0)
+    y_0 = rng.standard_normal((m, 2))
+    c = rng.uniform(0.1, 1, m)
+    f = lambda x, y, c: np.stack([y[:,1], -c*y[:,1]-y[:,0]], axis=1)
+
+    start = time.perf_counter()
+    x, y = Ensemble_RungeKutta(f, 0, y_0, 0.01, 10, args=(c,), save=False)
+    elapsed = time.perf_counter() - start
+    print(f"Ensemble_RungeKutta: {m} 个成员，每秒 {m/elapsed:.0f} 个")
+    start = time.perf_counter()
+    for i in range(100):
+        r4RungeKutta(lambda x, y: np.array([y[1], -c[i]*y[1]-y[0]]), 0, y_0[i], 0.01, 10)
+    print(f"逐个调用 r4RungeKutta：每秒 {100/(time.perf_counter() - start):.0f} 个")
+
+    start = time.perf_counter()
+    x, y, accepted, rejected = Ensemble_VariableStepSize_RungeKutta(
+        f, 0, y_0, 0.1, 10, 1e-8, args=(c,), full_output=True)
+    elapsed = time.perf_counter() - start
+    print(f"Ensemble_VariableStepSize_RungeKutta: {m} 个成员，每秒 {m/elapsed:.0f} 个，"
+          f"接受 {accepted.min()}~{accepted.max()} 步，拒绝 {rejected.min()}~{rejected.max()} 步")
@@ -2,78 +2,131 @@
 # -*- coding: utf-8 -*-
 from numbers import Number
 from typing import Callable
+import numpy as np
 
 try:
     from .ode__typing import X,Y
-    from .iter_condition import StopCondition, stopAt
+    from .ode__trajectory import Trajectory, steps
+    from .iter_condition import StopCondition, astopAt
+    from . import ode__inplace
+    from . import ode__newton
+    from .ode_rk_tableau import RungeKutta, Euler1
 except:
     from ode__typing import X,Y
-    from iter_condition import StopCondition, stopAt
+    from ode__trajectory import Trajectory, steps
+    from iter_condition import StopCondition, astopAt
+    import ode__inplace
+    import ode__newton
+    from ode_rk_tableau import RungeKutta, Euler1
 
 #y'=f(x,y)
 
 '''欧拉折线法以及一些变种'''
 
 def Euler(
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     x_0:X, y_0:Y, 
-    h:Number, max_x:Number
-    ) -> tuple[list[X],list[Y]]:
+    h:Number, max_x:Number,
+    inplace:bool = False
+    ) -> tuple[np.ndarray,np.ndarray]:
     '''欧拉折线法
     用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
     迭代至 x >= max_x 为止，每次步长为 h
-    精度 O(h)，稳定区间为 h*f(x,y)/y in [-2,0]'''
-    x=[x_0]; y=[y_0]
-    while x[-1] < max_x:
-        y.append(y[-1]+h*f(x[-1],y[-1]))
-        x.append(x[-1]+h)
-    return x,y
+    精度 O(h)，稳定区间为 h*f(x,y)/y in [-2,0]
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace'''
+    if inplace:
+        return RungeKutta(f, x_0, y_0, h, max_x, Euler1, inplace=True)
+    trajectory = Trajectory([x_0], [y_0], steps(x_0, max_x, h))
+    x = x_0; y = y_0
+    while x < max_x:
+        y = y+h*f(x,y)
+        x = x+h
+        trajectory.append(x, y)
+    return trajectory.result()
 
 def EulerImplicit(
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     x_0:X, y_0:Y, 
     h:Number, max_x:Number, 
-    stop:StopCondition = stopAt(e=0, rel_e=1e-10, max_iter=1000)
-    ) -> tuple[list[X],list[Y]]:
+    stop:StopCondition = astopAt(e=0, rel_e=1e-10, max_iter=1000),
+    inplace:bool = False,
+    newton:bool = False,
+    df:Callable[[X, Y], np.ndarray] = None,
+    rate:Number = 0.5
+    ) -> tuple[np.ndarray,np.ndarray]:
     '''隐式欧拉折线法
     用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
     迭代至 x >= max_x 为止，每次步长为 h
     精度 O(h)，稳定区间为 h*f(x,y)/y < 0
-    每次迭代需要进行子迭代：y[n+1]=y[n]+h*f(x[n+1],y[n+1])'''
-    x=[x_0]; y=[y_0]
-    while x[-1] < max_x:
-        x.append(x[-1]+h)
-        newy = y[-1]; y.append(0)
+    每次迭代需要进行子迭代：y[n+1]=y[n]+h*f(x[n+1],y[n+1])
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace
+    newton 为 True 时，子迭代改用简化牛顿法，df(x, y) 为雅可比矩阵（None 时用差商），rate 见 ode__newton'''
+    trajectory = Trajectory([x_0], [y_0], steps(x_0, max_x, h))
+    if newton:
+        return ode__newton.implicit(f, trajectory, [x_0], [y_0], h, max_x, 1, [], stop, df, rate, inplace)
+    if inplace:
+        return ode__inplace.implicit(f, trajectory, x_0, ode__inplace.state(y_0), [], h, max_x, 1, [], stop)
+    x = x_0; y = y_0
+    while x < max_x:
+        x = x+h
+        newy = y; lasty = 0
         times = 0
-        while not stop(y[-1], newy, times):
-            y[-1] = newy
-            newy = y[-2] + h*f(x[-1],y[-1])
+        while not stop(lasty, newy, times):
+            lasty = newy
+            newy = y + h*f(x,lasty)
             times += 1
-        y[-1] = newy
-    return x,y
+        y = newy
+        trajectory.append(x, y)
+    return trajectory.result()
 
 def EulerImproved(
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     x_0:X, y_0:Y, 
     h:Number, max_x:Number, 
-    stop:StopCondition = stopAt(e=0, rel_e=1e-10, max_iter=1000)
-    ) -> tuple[list[X],list[Y]]:
+    stop:StopCondition = astopAt(e=0, rel_e=1e-10, max_iter=1000),
+    inplace:bool = False,
+    newton:bool = False,
+    df:Callable[[X, Y], np.ndarray] = None,
+    rate:Number = 0.5
+    ) -> tuple[np.ndarray,np.ndarray]:
     '''改进欧拉折线法（梯形方法）
     用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
     迭代至 x >= max_x 为止，每次步长为 h
     精度 O(h^2)，稳定区间为 h*f(x,y)/y < 0
-    每次迭代需要进行子迭代：y[n+1]=y[n]+h/2*(f(x[n+1],y[n+1])+f(x[n],y[n]))'''
-    x=[x_0]; y=[y_0]; h2 = h/2
-    while x[-1] < max_x:
-        x.append(x[-1]+h)
-        newy = y[-1]; y.append(0)
-        times = 0; temp = f(x[-2],y[-2])
-        while not stop(y[-1], newy, times):
-            y[-1] = newy
-            newy = y[-2] + h2*(f(x[-1],y[-1])+temp)
+    每次迭代需要进行子迭代：y[n+1]=y[n]+h/2*(f(x[n+1],y[n+1])+f(x[n],y[n]))
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace
+    newton 为 True 时，子迭代改用简化牛顿法，df(x, y) 为雅可比矩阵（None 时用差商），rate 见 ode__newton'''
+    trajectory = Trajectory([x_0], [y_0], steps(x_0, max_x, h))
+    if newton:
+        return ode__newton.implicit(f, trajectory, [x_0], [y_0], h, max_x, 0.5, [0.5], stop, df, rate, inplace)
+    if inplace:
+        return ode__inplace.implicit(f, trajectory, x_0, ode__inplace.state(y_0),
+                                     ode__inplace.history(f, [x_0], [y_0], 1), h, max_x, 0.5, [0.5], stop)
+    x = x_0; y = y_0; h2 = h/2
+    while x < max_x:
+        times = 0; temp = f(x,y)
+        x = x+h
+        newy = y; lasty = 0
+        while not stop(lasty, newy, times):
+            lasty = newy
+            newy = y + h2*(f(x,lasty)+temp)
             times += 1
-        y[-1] = newy
-    return x,y
+        y = newy
+        trajectory.append(x, y)
+    return trajectory.result()
 
 if __name__ == "__main__":
-    pass    #预留，不做任何处理
\ No newline at end of file
+    #刚性问题 y' = -1000*(y-cos(x)) - sin(x), y(0) = 1，精确解为 cos(x)
+    #h = 0.05 时 h*|df/dy| = 50，不动点迭代发散，简化牛顿法每步只需计算约两次 f
+    count = [0]
+    def f(x, y):
+        count[0] += 1
+        return -1000*(y-np.cos(x)) - np.sin(x)
+    for name, method in [("EulerImplicit", EulerImplicit), ("EulerImproved", EulerImproved)]:
+        count[0] = 0
+        x, y = method(f, 0, 1, 0.05, 2, newton=True)
+        print(f"{name}：{len(x)-1} 步，f 的计算次数 {count[0]}，最大误差 {np.max(np.abs(y-np.cos(x))):.2e}")
+        count[0] = 0
+        with np.errstate(all="ignore"):
+            x, y = method(f, 0, 1, 0.05, 2)
+        print(f"{name}（不动点迭代）：f 的计算次数 {count[0]}，最大误差 {np.max(np.abs(y-np.cos(x))):.2e}")
\ No newline at end of file
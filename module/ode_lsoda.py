@@ -0,0 +1,207 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from numbers import Number
+from typing import Callable
+import numpy as np
+
+try:
+    from .ode__typing import X,Y
+    from .ode__trajectory import Trajectory
+    from .ode_bdf import BDFSolver, change_D, initial_step, _rms
+except:
+    from ode__typing import X,Y
+    from ode__trajectory import Trajectory
+    from ode_bdf import BDFSolver, change_D, initial_step, _rms
+
+#y'=f(x,y)
+
+'''刚性的自动检测与方法切换（LSODA 的思路）
+
+事先往往不知道一个问题是否刚性，有的问题在积分过程中还会改变性质（比如 van der Pol 方程，缓慢变化的阶段刚性，快速跳变的阶段不刚性）。
+显式方法对刚性问题的步长受稳定性限制：设 rho 为雅可比矩阵 J = df/dy 的谱半径，Adams 预估-校正方法要求 h*rho 不超过
+稳定区间的长度（见 STABILITY），即使解已经很光滑、精度允许更大的步长也是如此；隐式的 BDF 方法没有这个限制，
+但每步要解非线性方程组，需要雅可比矩阵与 lu 分解，对非刚性问题反而更费。
+
+这里从非刚性的 Adams 方法开始积分，并在积分过程中判断刚性：
+ 1. 步长受限：Adams 方法的步长停止增长（出现被拒绝的步，或步长不大于上次检查时）时才作进一步检查；
+ 2. 谱半径的估计：用幂法估计 rho，J*v 用差商 (f(x, y+eps*v)-f(x, y))/eps 计算，不需要计算 J 本身，
+    起始向量用上次的结果，通常迭代两三次即可；
+ 3. h*rho 超过稳定区间的 STIFF 倍，且主特征值的实部为负（由 Rayleigh 商判断；实部为正的分量是真实的快速增长，
+    步长本来就要由精度决定，比如二体问题的近日点附近），说明步长是被稳定性而不是精度限制的，判为刚性，改用 ode_bdf 中的 BDF 方法；
+    BDF 方法每 CHECK_EVERY 步同样估计 rho，h*rho 小于 Adams 方法稳定区间的 NONSTIFF 倍时，
+    Adams 方法用这样的步长也是稳定的，判为非刚性，改回 Adams 方法。两个阈值不同，以免来回切换。
+切换时新的方法从当前的点与步长出发，从一阶开始重新积累历史，Adams 方法升到最高阶之后才检查，以免刚切换就又切换回去。'''
+
+ADAMS_ORDER = 4
+#k 阶 Adams 预估-校正方法 (PECE) 对 y' = lambda*y 的稳定区间为 h*lambda 属于 [-STABILITY[k], 0]（数值求得）
+STABILITY = np.array([0, 2.0, 2.4, 1.9, 1.4])
+CHECK_EVERY = 10
+STIFF = 0.7
+NONSTIFF = 0.35
+POWER_ITER = 8
+MIN_FACTOR = 0.2
+MAX_FACTOR = 5
+
+#Adams 外推公式的向后差分形式 y[n+1] = y[n] + h*sum(adams[j]*nabla^j f[n], j = 0..k-1)
+#k 阶外推公式加上 h*adams[k]*nabla^k f[n+1] 即为 k+1 阶的内插公式
+adams = [1.]
+for k in range(1, ADAMS_ORDER+1):
+    adams.append(1-sum(adams[j]/(k+1-j) for j in range(k)))
+adams = np.array(adams)
+
+def spectral_radius(
+    fun:Callable[[X, np.ndarray], np.ndarray], x:X, y:np.ndarray, fy:np.ndarray,
+    v:np.ndarray, max_iter:int = POWER_ITER) -> tuple[Number, Number, np.ndarray]:
+    '''用幂法估计雅可比矩阵 df/dy 在 (x, y) 处的谱半径，J*v 用差商计算，y, fy 为一维数组
+    v 为起始向量（可以用上次的结果），返回 (谱半径的估计, Rayleigh 商 v*J*v, 最后的单位向量)
+    Rayleigh 商近似主特征值的实部，为负时主特征值对应衰减的分量；
+    主特征值为一对共轭复数时幂法不收敛，此时返回的是 |J*v| 的最后一次值，仍有谱半径的量级'''
+    eps = np.sqrt(np.finfo(float).eps)*(1+np.linalg.norm(y))
+    v = v/np.linalg.norm(v); rho = 0
+    for _ in range(max_iter):
+        Jv = (fun(x, y+eps*v)-fy)/eps
+        norm = np.linalg.norm(Jv)
+        if norm == 0 or not np.isfinite(norm): return 0, 0, v
+        rayleigh = v @ Jv
+        v = Jv/norm
+        if abs(norm-rho) <= 0.05*norm: return norm, rayleigh, v
+        rho = norm
+    return rho, rayleigh, v
+
+class AdamsSolver:
+    '''逐步推进的变步长 Adams 预估-校正方法 (PECE)，用于非刚性问题
+    预估用 k 阶 Adams 外推公式，校正用 k+1 阶 Adams 内插公式，两者之差作为局部误差估计；
+    阶数从 1 开始，历史足够时逐步升到 max_order（最高 ADAMS_ORDER）。
+    f 的向后差分存放在 F 中（F[j] = nabla^j f[n]），改变步长时同 BDF 方法一样用 ode_bdf.change_D 对 F 作变换。
+    参数与各属性的含义同 ode_bdf.BDFSolver，fy 为 f 在当前点的值'''
+
+    def __init__(
+        self, f:Callable[[X, Y], Y],
+        x_0:X, y_0:Y, max_x:Number,
+        max_error:Number = 1e-6, rel_error:Number = 1e-3,
+        init_h:Number = None,
+        max_order:int = ADAMS_ORDER):
+        self.f = f
+        self.shape = np.shape(y_0)
+        self.x = x_0; self.y = np.array(y_0, dtype=float).reshape(-1)
+        self.max_x = max_x
+        self.max_error, self.rel_error = max_error, rel_error
+        self.max_order = max_order
+        self.accepted = self.rejected = self.evaluations = self.jacobians = self.factorizations = 0
+        self.fy = self.fun(x_0, self.y)
+        self.h = initial_step(self.fun, x_0, self.y, self.fy, max_x, max_error, rel_error) if init_h is None else min(init_h, max_x-x_0)
+        self.F = np.zeros((max_order+2, self.y.size))
+        self.F[0] = self.fy
+        self.order = 1; self.history = 0       #history 为 F 中已有的（非零）差分的最高阶数
+
+    def fun(self, x:X, y:np.ndarray) -> np.ndarray:
+        self.evaluations += 1
+        return np.asarray(self.f(x, y.reshape(self.shape)), dtype=float).reshape(-1)
+
+    def resize(self, factor:Number) -> None:
+        '''步长变为 factor 倍'''
+        self.h *= factor
+        change_D(self.F, self.order, factor)
+
+    def step(self) -> None:
+        '''推进一步（包括被拒绝后的重算），步长小到无法推进 x 时抛出 RuntimeError'''
+        F, order = self.F, self.order
+        min_h = 10*abs(np.nextafter(self.x, np.inf)-self.x)
+        while True:
+            if self.h < min_h:
+                raise RuntimeError(f"步长过小，在 x = {self.x} 处无法继续")
+            if self.x+self.h > self.max_x:
+                self.resize((self.max_x-self.x)/self.h)
+            new_x = self.x+self.h if self.x+self.h < self.max_x else self.max_x
+            y_predict = self.y + self.h*(adams[:order] @ F[:order])
+            nabla = self.fun(new_x, y_predict) - np.sum(F[:order], axis=0)     #nabla^k f[n+1]，f[n+1] 取预估值处的值
+            error = self.h*adams[order]*nabla
+            y_new = y_predict + error
+            scale = self.max_error + self.rel_error*np.maximum(np.abs(self.y), np.abs(y_new))
+            error_norm = _rms(error/scale)
+            if error_norm <= 1: break
+            self.rejected += 1
+            self.resize(MIN_FACTOR if not np.isfinite(error_norm) else max(MIN_FACTOR, 0.9*error_norm**(-1/(order+1))))
+        self.accepted += 1
+        self.x, self.y = new_x, y_new
+        self.fy = self.fun(new_x, y_new)
+        #更新向后差分：新的 nabla^j f[n+1] = nabla^(j-1) f[n+1] - nabla^(j-1) f[n]
+        last = self.fy
+        for j in range(order+2):
+            F[j], last = last, last-F[j]
+        self.history = min(self.history+1, order+1)
+        if order < self.max_order and self.history > order: self.order = order+1
+        factor = 0.9*error_norm**(-1/(order+1)) if error_norm > 0 else MAX_FACTOR
+        self.resize(min(MAX_FACTOR, max(MIN_FACTOR, factor)))
+
+def LSODA(
+    f:Callable[[X, Y], Y],
+    x_0:X, y_0:Y, max_x:Number,
+    max_error:Number = 1e-6, rel_error:Number = 1e-3,
+    init_h:Number = None,
+    df:Callable[[X, Y], np.ndarray] = None,
+    band:tuple[int, int] = None,
+    full_output:bool = False
+    ) -> tuple[np.ndarray,np.ndarray]|tuple[np.ndarray,np.ndarray,int,int,int,int,int,list[tuple[X, str]]]:
+    '''自动在 Adams 方法与 BDF 方法之间切换的变步长方法，见模块说明
+    用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
+    迭代至 x = max_x 为止，每步的局部误差估计不超过 max_error + rel_error*|y|（逐分量，取均方根）
+    df, band 为 BDF 方法使用的雅可比矩阵与带宽，见 ode_bdf.BDF
+    full_output 为 True 时额外返回接受的步数、拒绝的步数，f（包括估计谱半径所用的）、雅可比矩阵的计算次数，lu 分解的次数，
+    以及各切换点的列表 [(x, 切换后的方法 "BDF" 或 "Adams"), ...]'''
+    solver = AdamsSolver(f, x_0, y_0, max_x, max_error, rel_error, init_h)
+    trajectory = Trajectory([x_0], [y_0])
+    totals = np.zeros(5, dtype=int)
+    switches = []
+    v = np.ones(solver.y.size)
+    checked_h, checked_rejected = 0, 0
+    counters = lambda s: np.array([s.accepted, s.rejected, s.evaluations, s.jacobians, s.factorizations])
+    while solver.x < max_x:
+        solver.step()
+        trajectory.append(solver.x, solver.y.reshape(solver.shape))
+        if solver.accepted % CHECK_EVERY or solver.x >= max_x: continue
+        stiff = isinstance(solver, BDFSolver)
+        if not stiff:
+            if solver.order < solver.max_order: continue
+            #步长仍在增长、没有被拒绝的步时，步长是由精度决定的，不必检查
+            limited = solver.rejected > checked_rejected or solver.h <= checked_h
+            checked_h, checked_rejected = solver.h, solver.rejected
+            if not limited: continue
+        fy = solver.fy if not stiff else solver.fun(solver.x, solver.y)
+        rho, rayleigh, v = spectral_radius(solver.fun, solver.x, solver.y, fy, v)
+        if stiff: switch = solver.h*rho < NONSTIFF*STABILITY[ADAMS_ORDER]
+        else: switch = solver.h*rho > STIFF*STABILITY[solver.order] and rayleigh < 0
+        if switch:
+            totals += counters(solver)
+            y = solver.y.reshape(solver.shape)
+            if stiff:
+                solver = AdamsSolver(f, solver.x, y, max_x, max_error, rel_error, solver.h)
+            else:
+                solver = BDFSolver(f, solver.x, y, max_x, max_error, rel_error, solver.h, df, band)
+            switches.append((solver.x, "Adams" if stiff else "BDF"))
+            checked_h, checked_rejected = 0, 0
+    x, y = trajectory.result()
+    if full_output:
+        return (x, y, *(int(n) for n in totals+counters(solver)), switches)
+    return x, y
+
+if __name__ == "__main__":
+    from ode_bdf import BDF
+
+    #van der Pol 方程 y'' - mu*(1-y^2)*y' + y = 0，mu 很大时缓慢变化的阶段刚性，快速跳变的阶段不刚性
+    mu = 1000
+    vdp = lambda x, y: np.array([y[1], mu*(1-y[0]**2)*y[1]-y[0]])
+    #二体问题（偏心率 0.5 的椭圆轨道），非刚性，不应切换到 BDF 方法
+    def kepler(x, y):
+        r3 = (y[0]**2+y[1]**2)**1.5
+        return np.array([y[2], y[3], -y[0]/r3, -y[1]/r3])
+    problems = [("van der Pol（mu = 1000）", vdp, np.array([2., 0]), 3000, {}),
+                ("二体问题（两个周期）", kepler, np.array([0.5, 0, 0, np.sqrt(3)]), 4*np.pi, {"max_error": 1e-8, "rel_error": 1e-8})]
+    for title, f, y_0, max_x, kwargs in problems:
+        for method in (LSODA, BDF):
+            result = method(f, 0, y_0, max_x, **kwargs, full_output=True)
+            x, y, accepted, rejected, evaluations, jacobians, factorizations = result[:7]
+            print(f"{title}，{method.__name__}：y = {y[-1]}，接受 {accepted} 步，拒绝 {rejected} 步，"
+                  f"f 的计算次数 {evaluations}，雅可比矩阵 {jacobians} 次，lu 分解 {factorizations} 次")
+            if method is LSODA:
+                print("  切换点：" + ("，".join(f"{x:.6g} -> {name}" for x, name in result[7]) or "无"))
@@ -2,13 +2,20 @@
 # -*- coding: utf-8 -*-
 from numbers import Number
 from typing import Callable
+import numpy as np
 
 try:
     from .ode__typing import *
-    from .iter_condition import StopCondition, stopAt
+    from .ode__trajectory import Trajectory, steps
+    from .iter_condition import StopCondition, astopAt
+    from . import ode__inplace
+    from . import ode__newton
 except:
     from ode__typing import *
-    from iter_condition import StopCondition, stopAt
+    from ode__trajectory import Trajectory, steps
+    from iter_condition import StopCondition, astopAt
+    import ode__inplace
+    import ode__newton
 
 '''线性多步法
 
@@ -33,10 +40,11 @@ y'[n-k] = y' - khy" + k^2 hhy"'/2 - ...
 def duostep(
     x_init:tuple[X0, X1]|list[X],
     y_init:tuple[Y0, Y1]|list[Y],
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     max_x:Number, 
-    h:Number
-    ) -> tuple[list[X],list[Y]]:
+    h:Number,
+    inplace:bool = False
+    ) -> tuple[np.ndarray,np.ndarray]:
     '''二步法
     用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
     迭代至 x >= max_x 为止，每次步长为 h，精度 O(h^2)
@@ -45,27 +53,33 @@ def duostep(
     要求y(x[n]])=y[n]是上述初值问题的解。
     通常情况下，会先用一个单步法得到 y(x[1]) = y[1]，再使用此方法
     
-    注意到这个函数的名字是“二步舞”，我对这个命名很满意'''
-    x=[x_i for x_i in x_init] 
-    y=[y_i for y_i in y_init]
-    dy = [0, f(x[-2],y[-2])]
+    注意到这个函数的名字是“二步舞”，我对这个命名很满意
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace'''
+    trajectory = Trajectory(x_init, y_init, steps(x_init[-1], max_x, h))
+    if inplace:
+        return ode__inplace.multistep(f, trajectory, x_init[-1], ode__inplace.state(y_init[-1]),
+                                      ode__inplace.history(f, x_init, y_init, 2), h, max_x, [3/2, -1/2])
+    x = x_init[-1]; y = y_init[-1]
+    dy = [0, f(x_init[-2],y_init[-2])]
     h2 = h/2
-    while x[-1] < max_x:
+    while x < max_x:
         for i in range(len(dy)-1):
             dy[i] = dy[i+1]
-        dy[-1] = f(x[-1], y[-1])
+        dy[-1] = f(x, y)
 
-        y.append(y[-1]+h2*(3*dy[-1]-dy[-2]))
-        x.append(x[-1]+h)
-    return x,y
+        y = y+h2*(3*dy[-1]-dy[-2])
+        x = x+h
+        trajectory.append(x, y)
+    return trajectory.result()
 
 def Adams(
     x_init:tuple[X0, X1, X2, X3]|list[X],
     y_init:tuple[Y0, Y1, Y2, Y3]|list[Y],
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     max_x:Number, 
-    h:Number
-    ) -> tuple[list[X],list[Y]]:
+    h:Number,
+    inplace:bool = False
+    ) -> tuple[np.ndarray,np.ndarray]:
     '''Adams外推公式
     这是一个四步法
     用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
@@ -74,28 +88,38 @@ def Adams(
     输入的 x_init 和 y_init 都是列表，列表中至少要有 4 个元素。
     要求y(x[n]])=y[n]是上述初值问题的解。
     通常情况下，会先用其他方法得到四个初值点，再使用此方法
-    (常用四阶Runge-Kutta法)'''
-    x=[x_i for x_i in x_init] 
-    y=[y_i for y_i in y_init]
-    dy = [0] + [f(x[i],y[i]) for i in range(-4,-1,1)]
+    (常用四阶Runge-Kutta法)
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace'''
+    trajectory = Trajectory(x_init, y_init, steps(x_init[-1], max_x, h))
+    if inplace:
+        return ode__inplace.multistep(f, trajectory, x_init[-1], ode__inplace.state(y_init[-1]),
+                                      ode__inplace.history(f, x_init, y_init, 4), h, max_x,
+                                      [55/24, -59/24, 37/24, -9/24])
+    x = x_init[-1]; y = y_init[-1]
+    dy = [0] + [f(x_init[i],y_init[i]) for i in range(-4,-1,1)]
     h24 = h/24
-    while x[-1] < max_x:
+    while x < max_x:
         for i in range(len(dy)-1):
             dy[i] = dy[i+1]
-        dy[-1] = f(x[-1], y[-1])
+        dy[-1] = f(x, y)
 
-        y.append(y[-1]+h24*(55*dy[-1]-59*dy[-2]+37*dy[-3]-9*dy[-4]))
-        x.append(x[-1]+h)
-    return x,y
+        y = y+h24*(55*dy[-1]-59*dy[-2]+37*dy[-3]-9*dy[-4])
+        x = x+h
+        trajectory.append(x, y)
+    return trajectory.result()
 
 def AdamsImplicit(
     x_init:tuple[X0, X1, X2]|list[X],
     y_init:tuple[Y0, Y1, Y2]|list[Y],
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     max_x:Number, 
     h:Number,
-    stop:StopCondition = stopAt(e=0, rel_e=1e-10, max_iter=1000)
-    ) -> tuple[list[X],list[Y]]:
+    stop:StopCondition = astopAt(e=0, rel_e=1e-10, max_iter=1000),
+    inplace:bool = False,
+    newton:bool = False,
+    df:Callable[[X, Y], np.ndarray] = None,
+    rate:Number = 0.5
+    ) -> tuple[np.ndarray,np.ndarray]:
     '''Adams内插公式
     这是一个四步法
     用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
@@ -105,26 +129,36 @@ def AdamsImplicit(
     四步法只要三个元素，是因为有一步是隐式存在的，所以只需要三个初值点
     要求y(x[n]])=y[n]是上述初值问题的解。
     通常情况下，会先用其他方法得到三个初值点，再使用此方法
-    (常用四阶Runge-Kutta法)'''
-    x=[x_i for x_i in x_init] 
-    y=[y_i for y_i in y_init]
-    dy = [f(x[i],y[i]) for i in range(-3,-1,1)]
+    (常用四阶Runge-Kutta法)
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace
+    newton 为 True 时，子迭代改用简化牛顿法，df(x, y) 为雅可比矩阵（None 时用差商），rate 见 ode__newton'''
+    trajectory = Trajectory(x_init, y_init, steps(x_init[-1], max_x, h))
+    if newton:
+        return ode__newton.implicit(f, trajectory, x_init, y_init, h, max_x,
+                                    9/24, [19/24, -5/24, 1/24], stop, df, rate, inplace)
+    if inplace:
+        return ode__inplace.implicit(f, trajectory, x_init[-1], ode__inplace.state(y_init[-1]),
+                                     ode__inplace.history(f, x_init, y_init, 3), h, max_x,
+                                     9/24, [19/24, -5/24, 1/24], stop)
+    x = x_init[-1]; y = y_init[-1]
+    dy = [f(x_init[i],y_init[i]) for i in range(-3,0,1)]
     h24 = h/24
-    while x[-1] < max_x:
-        x.append(x[-1]+h)
-        newy = y[-1]; y.append(0)
+    while x < max_x:
+        x = x+h
+        newy = y; lasty = 0
         
         times = 0; temp = h24*(19*dy[-1] - 5*dy[-2] + dy[-3])
-        while not stop(y[-1], newy, times):
-            y[-1] = newy
-            newy = y[-2] + temp + h24*(9*f(x[-1], y[-1]))
+        while not stop(lasty, newy, times):
+            lasty = newy
+            newy = y + temp + h24*(9*f(x, lasty))
             times += 1
-        y[-1] = newy
+        y = newy
+        trajectory.append(x, y)
         for i in range(len(dy)-1):
             dy[i] = dy[i+1]
-        dy[-1] = f(x[-1], y[-1])
+        dy[-1] = f(x, y)
         
-    return x,y
+    return trajectory.result()
 
 if __name__ == "__main__":
     pass    #预留，不做任何处理
\ No newline at end of file
@@ -3,9 +3,17 @@
 from numbers import Number
 from typing import Callable
 from fractions import Fraction
+import json, os
+import numpy as np
 
-try: from .ode__typing import X,Y
-except: from ode__typing import X,Y
+try:
+    from .ode__typing import X,Y
+    from .ode__trajectory import Trajectory, steps
+    from . import ode__inplace
+except:
+    from ode__typing import X,Y
+    from ode__trajectory import Trajectory, steps
+    import ode__inplace
 
 #y'=f(x,y)
 
@@ -28,49 +36,79 @@ def Gauss_origin(a:list[list[Fraction]], b:list[Fraction]) -> list[Fraction]:
                 a[j][k] -= a[i][k]*temp
     return b
 
-def getweight(rank:int):
-    a = [[Fraction((-i)**j) for i in range(rank)] for j in range(rank)]
-    b = [Fraction(1,k) for k in range(1,rank+1)]
-    return Gauss_origin(a,b)
+#已经计算的系数表，键为 (rank, implicit)，同一阶的系数在进程中只计算一次
+_weights:dict[tuple[int, bool], tuple[Fraction, ...]] = {}
+
+def getweight(rank:int, implicit:bool = False) -> list[Fraction]:
+    '''rank 阶 Adams 公式的系数（无误差的分数），解 rank 阶的线性方程组，结果缓存在 _weights 中
+    implicit 为 False 时为外推公式 (Adams-Bashforth)：y[n+1] = y[n] + h*sum(weight[i]*f[n-i], i = 0..rank-1)
+    implicit 为 True 时为内插公式 (Adams-Moulton)：y[n+1] = y[n] + h*sum(weight[i]*f[n+1-i], i = 0..rank-1)
+    返回的是新的列表，可以修改'''
+    key = (rank, implicit)
+    if key not in _weights:
+        shift = 1 if implicit else 0
+        a = [[Fraction((shift-i)**j) for i in range(rank)] for j in range(rank)]
+        b = [Fraction(1,k) for k in range(1,rank+1)]
+        _weights[key] = tuple(Gauss_origin(a,b))
+    return list(_weights[key])
+
+def save_weights(path:str) -> None:
+    '''把已经计算的系数表写入 json 文件，键为 "AB阶数"/"AM阶数"，分数写成 "分子/分母" 的字符串'''
+    table = {f"{'AM' if implicit else 'AB'}{rank}": [str(w) for w in weight]
+             for (rank, implicit), weight in sorted(_weights.items())}
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(table, file, indent=1)
+
+def load_weights(path:str) -> None:
+    '''读入 save_weights 写入的系数表，此后这些阶数不再重新计算；文件不存在时不做任何事'''
+    if not os.path.exists(path): return
+    with open(path, encoding="utf-8") as file:
+        table = json.load(file)
+    for name, weight in table.items():
+        _weights[(int(name[2:]), name[:2] == "AM")] = tuple(Fraction(w) for w in weight)
 
 def multistep(
     x_init:list[X],
     y_init:list[Y],
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     max_x:Number, 
     h:Number,
-    rank:int
-    ) -> tuple[list[X],list[Y]]:
-    '''rank 阶多点法'''
-    x=[x_i for x_i in x_init] 
-    y=[y_i for y_i in y_init]
+    rank:int,
+    inplace:bool = False
+    ) -> tuple[np.ndarray,np.ndarray]:
+    '''rank 阶多点法
+    f 的历史值存放在 (rank, *y.shape) 的环形缓冲区中，每步只写入最新的一行，不移动其余各行；
+    系数按最新一行的位置预先轮换好，加权和为一次矩阵乘法
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace'''
+    trajectory = Trajectory(x_init, y_init, steps(x_init[-1], max_x, h))
+    x = x_init[-1]; y = y_init[-1]
 
     weight = getweight(rank)
     k = len(weight)
+    if inplace:
+        return ode__inplace.multistep(f, trajectory, x, ode__inplace.state(y),
+                                      ode__inplace.history(f, x_init, y_init, k), h, max_x,
+                                      [float(w) for w in weight])
 
-    #'''
-    dominator_LCM = 1
-    for i in range(k):
-        temp = weight[i].denominator
-        dominator_LCM *= temp
-        for j in range(k):
-            weight[j]*=temp
-    for i in range(k):
-        weight[i] = int(weight[i])
-    divided_h = h/dominator_LCM
-    '''
-    divided_h = h
-    #'''
-    
-    dy = [0] + [f(x[i],y[i]) for i in range(-k,-1,1)]
-    
-    while x[-1] < max_x:
-        for i in range(len(dy)-1):
-            dy[i] = dy[i+1]
-        dy[-1] = f(x[-1], y[-1])
-        y.append(y[-1]+divided_h*sum([dy[-i-1]*weight[i] for i in range(k)]))
-        x.append(x[-1]+h)
-    return x,y
+    #第 p 行为最新的 f[n] 时，f[n-i] 在第 (p-i)%k 行，rotated[p] 为相应排列的系数
+    rotated = np.empty((k, k))
+    for p in range(k):
+        rotated[p, (p-np.arange(k))%k] = [float(w) for w in weight]
+    rotated *= h
+    y_0 = np.asarray(y)
+    dy = np.empty((k,)+y_0.shape, dtype=np.result_type(y_0, float))
+    flat = dy.reshape(k, -1)                #同一块存储的 (k, y.size) 视图
+    for i in range(1, k):
+        dy[i-1] = f(x_init[i-k-1], y_init[i-k-1])
+    p = k-1
+
+    while x < max_x:
+        dy[p] = f(x, y)
+        y = y+(rotated[p] @ flat).reshape(y_0.shape)
+        x = x+h
+        trajectory.append(x, y)
+        p = p+1 if p+1 < k else 0
+    return trajectory.result()
 
 def test(f, x0, max_x, h,  g, rank, func):
     #y = g(x)
@@ -107,8 +145,9 @@ if __name__ == "__main__":
         #'''
         print(f"{i}阶多步法误差为", end="")
         try:
-            test(f, x0, max_x, h, g, i, multistep)
-        except OverflowError as e:
+            with np.errstate(over="raise", invalid="raise"):   #加权和由 numpy 计算，溢出时同样报错
+                test(f, x0, max_x, h, g, i, multistep)
+        except (OverflowError, FloatingPointError) as e:
             print("OverflowError")
         #'''
     #'''
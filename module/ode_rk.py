@@ -2,11 +2,14 @@
 # -*- coding: utf-8 -*-
 from numbers import Number
 from typing import Callable
+import numpy as np
 
 try:
     from .ode__typing import X,Y
+    from .ode_rk_tableau import RungeKutta, tableau
 except:
     from ode__typing import X,Y
+    from ode_rk_tableau import RungeKutta, tableau
 
 #y'=f(x,y)
 
@@ -26,44 +29,49 @@ y[n+1] = y[n] + h*c*k 即完成计算
 
 隐式 RK 方法类似，但不要求 a_1 = 0, 也不要求 B 为主对角线为零的下半矩阵
 此时用 k = f(x+h*a, y+B*k) 进行迭代
+
+下面各方法由参数构造 Butcher 表，交给 ode_rk_tableau 中的通用实现计算
 '''
 
 def r2RungeKutta(
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     x_0:X, y_0:Y, 
     h:Number, max_x:Number,
-    c1=0.0, c2=1.0, a2=0.5, b21=0.5
-    ) -> tuple[list[X],list[Y]]:
+    c1=0.0, c2=1.0, a2=0.5, b21=0.5,
+    inplace:bool = False,
+    t_eval:np.ndarray = None,
+    events:list[Callable] = None
+    ) -> tuple[np.ndarray,np.ndarray]:
     '''二阶Runge-Kutta法
     用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
     迭代至 x >= max_x 为止，每次步长为 h，精度 O(h^2)
     参数要求：c1+c2==1, a2*c2==0.5, b21*c2==0.5
 
     如果未指定参数，用默认输入，这是中点法（或者称为显式梯形法）
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace
+    给出 t_eval 时返回 t_eval 各点处的 (x, y)，由每步之内的三次 Hermite 插值得到，见 ode__dense
+    给出 events 时检测各事件，额外返回各事件发生处的 x 与 y，见 ode__event
     '''
-    x=[x_0,]; y=[y_0,]
-    while x[-1] < max_x:
-        k1 = f(x[-1],y[-1])
-        k2 = f(x[-1]+h*a2, y[-1]+h*b21*k1)
-        x.append(x[-1]+h)
-        y.append(y[-1]+h*(c1*k1+c2*k2))
-    return (x,y)
-def Midpoint(f,x,y,h,max_x):
-    return r2RungeKutta(f,x,y,h,max_x)
-def EulerModified(f,x,y,h,max_x):
-    return r2RungeKutta(f,x,y,h,max_x,c1=0.5,c2=0.5,a2=1,b21=1)
-def Heun(f,x,y,h,max_x):                              #Heun方法
-    return r2RungeKutta(f,x,y,h,max_x,c1=0.25,c2=0.75,a2=2/3,b21=2/3)
+    return RungeKutta(f, x_0, y_0, h, max_x, tableau([0, a2], [[b21]], [c1, c2], order=2), inplace, t_eval, events)
+def Midpoint(f,x,y,h,max_x,inplace=False):
+    return r2RungeKutta(f,x,y,h,max_x,inplace=inplace)
+def EulerModified(f,x,y,h,max_x,inplace=False):
+    return r2RungeKutta(f,x,y,h,max_x,c1=0.5,c2=0.5,a2=1,b21=1,inplace=inplace)
+def Heun(f,x,y,h,max_x,inplace=False):                #Heun方法
+    return r2RungeKutta(f,x,y,h,max_x,c1=0.25,c2=0.75,a2=2/3,b21=2/3,inplace=inplace)
 r2Heun = Heun #Name Alias: 二阶Heun方法
 
 #三阶Runge-Kutta法
 def r3RungeKutta(
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     x_0:X, y_0:Y, 
     h:Number, max_x:Number,
     c1=1/6, c2=2/3, c3=1/6,
     a2=0.5, b21=0.5,
-    a3=1.0, b31=-1.0, b32=2.0):
+    a3=1.0, b31=-1.0, b32=2.0,
+    inplace:bool = False,
+    t_eval:np.ndarray = None,
+    events:list[Callable] = None) -> tuple[np.ndarray,np.ndarray]:
     '''三阶Runge-Kutta法
     用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
     迭代至 x >= max_x 为止，每次步长为 h，精度 O(h^2)
@@ -71,29 +79,29 @@ def r3RungeKutta(
     a2*c2+a3*c3==0.5, c2*a2**2+c3*a3**2==1/3
     c3*a2*b32=1/6
     如果未指定参数，用默认输入，这是Kutta法
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace
+    给出 t_eval 时返回 t_eval 各点处的 (x, y)，由每步之内的三次 Hermite 插值得到，见 ode__dense
+    给出 events 时检测各事件，额外返回各事件发生处的 x 与 y，见 ode__event
     '''
-    x=[x_0,]; y=[y_0,]
-    while x[-1] < max_x:
-        k1 = f(x[-1],y[-1])
-        k2 = f(x[-1]+h*a2, y[-1]+h*b21*k1)
-        k3 = f(x[-1]+h*a3, y[-1]+h*(b31*k1+b32*k2))
-        x.append(x[-1]+h)
-        y.append(y[-1]+h*(c1*k1+c2*k2+c3*k3))
-    return (x,y)
-def Kutta(f,x,y,h,max_x):                             #Kutta法
-    return r3RungeKutta(f,x,y,h,max_x)
-def r3Heun(f,x,y,h,max_x):                            #三阶Heun方法
-    return r3RungeKutta(f,x,y,h,max_x,c1=0.25,c2=0,c3=0.75,a2=1/3,b21=1/3,a3=2/3,b31=0,b32=2/3)
+    tab = tableau([0, a2, a3], [[b21], [b31, b32]], [c1, c2, c3], order=3)
+    return RungeKutta(f, x_0, y_0, h, max_x, tab, inplace, t_eval, events)
+def Kutta(f,x,y,h,max_x,inplace=False):               #Kutta法
+    return r3RungeKutta(f,x,y,h,max_x,inplace=inplace)
+def r3Heun(f,x,y,h,max_x,inplace=False):              #三阶Heun方法
+    return r3RungeKutta(f,x,y,h,max_x,c1=0.25,c2=0,c3=0.75,a2=1/3,b21=1/3,a3=2/3,b31=0,b32=2/3,inplace=inplace)
 
 #四阶Runge-Kutta法
 def r4RungeKutta(
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     x_0:X, y_0:Y,
     h:Number, max_x:Number,
     c1=1/6, c2=1/3, c3=1/3, c4=1/6,
     a2=0.5, b21=0.5,
     a3=0.5, b31=0.0, b32=0.5,
-    a4=1.0, b41=0.0, b42=0.0, b43=1.0):
+    a4=1.0, b41=0.0, b42=0.0, b43=1.0,
+    inplace:bool = False,
+    t_eval:np.ndarray = None,
+    events:list[Callable] = None) -> tuple[np.ndarray,np.ndarray]:
     '''四阶Runge-Kutta法
     用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
     迭代至 x >= max_x 为止，每次步长为 h，精度 O(h^2)
@@ -103,18 +111,14 @@ def r4RungeKutta(
     参数要求未完待续
 
     如果未指定参数，用默认输入，这是经典Runge-Kutta法
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace
+    给出 t_eval 时返回 t_eval 各点处的 (x, y)，由每步之内的三次 Hermite 插值得到，见 ode__dense
+    给出 events 时检测各事件，额外返回各事件发生处的 x 与 y，见 ode__event
     '''
-    x=[x_0,]; y=[y_0,]
-    while x[-1] < max_x:
-        k1 = f(x[-1],y[-1])
-        k2 = f(x[-1]+h*a2, y[-1]+h*b21*k1)
-        k3 = f(x[-1]+h*a3, y[-1]+h*(b31*k1+b32*k2))
-        k4 = f(x[-1]+h*a4, y[-1]+h*(b41*k1+b42*k2+b43*k3))
-        x.append(x[-1]+h)
-        y.append(y[-1]+h*(c1*k1+c2*k2+c3*k3+c4*k4))
-    return (x,y)
-def classicalRungeKuta(f,x,y,h,max_x):                #经典Runge-Kutta法
-    return r4RungeKutta(f,x,y,h,max_x)
+    tab = tableau([0, a2, a3, a4], [[b21], [b31, b32], [b41, b42, b43]], [c1, c2, c3, c4], order=4)
+    return RungeKutta(f, x_0, y_0, h, max_x, tab, inplace, t_eval, events)
+def classicalRungeKuta(f,x,y,h,max_x,inplace=False):  #经典Runge-Kutta法
+    return r4RungeKutta(f,x,y,h,max_x,inplace=inplace)
 
 if __name__ == "__main__":
     pass    #预留，不做任何处理
\ No newline at end of file
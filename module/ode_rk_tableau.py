@@ -0,0 +1,272 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from numbers import Number
+from typing import Callable
+import numpy as np
+
+try:
+    from .ode__typing import X,Y
+    from .ode__trajectory import Trajectory, steps
+    from . import ode__inplace
+    from .ode__dense import Sampler
+    from .ode__event import Event, Tracker
+except:
+    from ode__typing import X,Y
+    from ode__trajectory import Trajectory, steps
+    import ode__inplace
+    from ode__dense import Sampler
+    from ode__event import Event, Tracker
+
+#y'=f(x,y)
+
+'''由 Butcher 表给出的显式 Runge-Kutta 方法
+
+s 级显式 RK 方法由 Butcher 表 (c, a, b) 确定：
+ k_i = f(x + c_i*h, y + h*sum(a_ij*k_j, j < i)),  y[n+1] = y[n] + h*sum(b_i*k_i)
+注意与 ode_rk 的记号不同：这里 c 为节点（ode_rk 中的 a），a 为系数矩阵（ode_rk 中的 B），b 为权重（ode_rk 中的 c）。
+
+嵌入式方法另有一组权重 b_hat，y[n] + h*sum(b_hat_i*k_i) 为另一个阶数的解，两者之差用于估计局部误差。
+
+若最后一级的节点为 1，且 a 的最后一行等于 b，则最后一级就是 f(x[n+1], y[n+1])，
+恰好是下一步的第一级，可以直接重复使用 (First Same As Last, FSAL)，每步少计算一次 f。
+
+各级 k 存放在预先分配的 (s, d) 缓冲区中，各级的加权和用一次 np.dot 写入缓冲区，每步不分配新的数组。
+
+给出 t_eval 时，在这些点上用一步之内的插值取值（见 ode__dense），不再保存各步的结果。
+给出 events 时，在每步之内检测事件 g(x, y) = 0，终止事件发生时停止积分（见 ode__event）。'''
+
+class ButcherTableau:
+    '''显式 Runge-Kutta 方法的 Butcher 表
+    c 为各级的节点 (s,)，a 为严格下三角的系数矩阵 (s, s)，b 为推进解所用的权重 (s,)
+    b_hat 为嵌入式方法的权重，定步长方法为 None；order, order_hat 分别为 b, b_hat 对应的阶数
+    dense 为连续延拓的系数 (s, 次数)，b_i(theta) = sum(dense[i,j]*theta**(j+1))，没有时为 None，见 ode__dense
+    一般用 tableau 构造'''
+
+    def __init__(self, c:np.ndarray, a:np.ndarray, b:np.ndarray, b_hat:np.ndarray = None,
+                 order:int = 0, order_hat:int = 0, dense:np.ndarray = None):
+        self.c, self.a, self.b, self.b_hat = c, a, b, b_hat
+        self.order, self.order_hat = order, order_hat
+        self.dense = dense
+        self.stages = len(c)
+        self.fsal = bool(c[-1] == 1 and np.array_equal(a[-1], b))
+        self.e = None if b_hat is None else b - b_hat     #局部误差估计的权重
+        #y 为数时逐项计算所用的系数，只保留非零项
+        self.nodes = c.tolist()
+        self.rows = [[(j, aij) for j, aij in enumerate(row[:i]) if aij != 0] for i, row in enumerate(a.tolist())]
+
+def tableau(
+    c:list[Number], a:list[list[Number]], b:list[Number],
+    b_hat:list[Number] = None, order:int = 0, order_hat:int = 0,
+    dense:list[list[Number]] = None) -> ButcherTableau:
+    '''构造 Butcher 表，a 的第 i 行为第 i+2 级的系数（第一级没有系数），b, b_hat 不足 s 个时补零'''
+    s = len(c)
+    matrix = np.zeros((s, s))
+    for i, row in enumerate(a):
+        matrix[i+1,:len(row)] = row
+    def weight(w):
+        result = np.zeros(s); result[:len(w)] = w
+        return result
+    return ButcherTableau(np.array(c, dtype=float), matrix, weight(b),
+                          None if b_hat is None else weight(b_hat), order, order_hat,
+                          None if dense is None else np.array(dense, dtype=float))
+
+def call(f:Callable, x:X, y:np.ndarray, out:np.ndarray, inplace:bool) -> None:
+    '''计算 f(x, y) 写入 out，inplace 为 True 时 f 为原地计算的形式 f(x, y, out)'''
+    if inplace: f(x, y, out)
+    else: out[...] = f(x, y)
+
+def buffers(y:np.ndarray, tab:ButcherTableau, inplace:bool = False) -> tuple[np.ndarray|list, np.ndarray|None]:
+    '''各级的缓冲区 k (s, *y.shape) 与临时缓冲区 t
+    y 为 0 维且 f 不是原地计算时，0 维 np.ndarray 的运算比数慢得多，此时 k 为数的 list，t 为 None'''
+    if y.ndim == 0 and not inplace:
+        return [0]*tab.stages, None
+    return np.empty((tab.stages,)+y.shape, dtype=y.dtype), np.empty_like(y)
+
+def stages(
+    f:Callable, x:X, y:Y, h:Number, tab:ButcherTableau,
+    k:np.ndarray|list, t:np.ndarray|None, inplace:bool = False, first_ready:bool = False) -> None:
+    '''计算各级 k[i]；first_ready 为 True 时 k[0] = f(x, y) 已经算好（比如 FSAL）'''
+    if t is None:
+        if not first_ready: k[0] = f(x, y)
+        for i in range(1, tab.stages):
+            weighted = 0
+            for j, aij in tab.rows[i]: weighted += aij*k[j]
+            k[i] = f(x+tab.nodes[i]*h, y+h*weighted)
+        return
+    flat_k = k.reshape(len(k), -1); flat_t = t.reshape(-1)
+    if not first_ready: call(f, x, y, k[0,...], inplace)
+    for i in range(1, tab.stages):
+        np.dot(tab.a[i,:i], flat_k[:i], out=flat_t)
+        flat_t *= h; t += y
+        call(f, x+tab.c[i]*h, t, k[i,...], inplace)
+
+def combine(out:np.ndarray|None, h:Number, weight:np.ndarray, k:np.ndarray|list, y:Y = None) -> Y:
+    '''out = y + h*sum(weight[i]*k[i])，y 为 None 时不加 y；返回 out
+    k 为数的 list 时（见 buffers）out 为 None，直接返回结果'''
+    if out is None:
+        result = 0
+        for wi, ki in zip(weight.tolist(), k):
+            if wi != 0: result += wi*ki
+        return h*result if y is None else y+h*result
+    flat_out = out.reshape(-1)
+    np.dot(weight, k.reshape(len(k), -1), out=flat_out)
+    flat_out *= h
+    if y is not None: out += y
+    return out
+
+def endpoint(f:Callable, x1:X, y1:Y, tab:ButcherTableau, k:np.ndarray|list, t:np.ndarray|None, inplace:bool) -> Y:
+    '''三次 Hermite 插值所需的 f(x1, y1)，x1, y1 为一步的终点
+    FSAL 的方法即为 k[-1]，否则计算一次 f，这也是下一步的第一级'''
+    if tab.fsal: return k[-1]
+    if t is None: return f(x1, y1)
+    out = np.empty_like(y1)
+    call(f, x1, y1, out, inplace)
+    return out
+
+def output(
+    f:Callable, x:X, x1:X, h:Number, y:Y, newy:Y, tab:ButcherTableau, k:np.ndarray|list, t:np.ndarray|None,
+    inplace:bool, sampler:Sampler|None, tracker:Tracker|None) -> tuple[Y|None, tuple[X, Y]|None]:
+    '''接受一步 (x, y) -> (x1, newy) 之后的稠密输出与事件检测
+    返回 (f1, hit)：f1 为需要三次 Hermite 插值时得到的 f(x1, newy)，否则为 None；
+    hit 为终止事件发生处的 (x, y)，没有时为 None，此时 t_eval 只计算到事件发生处为止'''
+    sample = sampler is not None and sampler.pending(x1)
+    crossed = tracker is not None and tracker.crossed(x1, newy)
+    if not (sample or crossed): return None, None
+    f1 = None if tab.dense is not None else endpoint(f, x1, newy, tab, k, t, inplace)
+    hit = tracker.locate(x, x1, h, tab, y, newy, k, f1) if crossed else None
+    if sample: sampler.fill(x, x1 if hit is None else hit[0], tab, h, y, newy, k, f1)
+    return f1, hit
+
+def RungeKutta(
+    f:Callable[[X, Y], Y],
+    x_0:X, y_0:Y,
+    h:Number, max_x:Number,
+    tab:ButcherTableau = None,
+    inplace:bool = False,
+    t_eval:np.ndarray = None,
+    events:list[Event|Callable] = None
+    ) -> tuple[np.ndarray,np.ndarray]|tuple[np.ndarray,np.ndarray,list[np.ndarray],list[np.ndarray]]:
+    '''由 Butcher 表 tab 给出的定步长显式 Runge-Kutta 方法，默认为经典Runge-Kutta法
+    用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
+    迭代至 x >= max_x 为止，每次步长为 h，嵌入式方法只使用 b
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace
+    给出 t_eval 时返回 t_eval 各点处的 (x, y)，由每步之内的插值得到，见 ode__dense
+    给出 events 时检测各事件，额外返回各事件发生处的 x 与 y（每个事件一个 array）；
+    终止事件发生时停止积分，最后一个点为事件发生处，见 ode__event'''
+    if tab is None: tab = Classical4
+    sampler = None if t_eval is None else Sampler(t_eval, x_0, max_x, y_0)
+    tracker = None if events is None else Tracker(events, x_0, y_0)
+    if t_eval is None: trajectory = Trajectory([x_0], [y_0], steps(x_0, max_x, h))
+    x = x_0; y = ode__inplace.state(y_0)
+    k, t = buffers(y, tab, inplace)
+    if t is None: y = y.item()
+    fsal = tab.fsal; first_ready = False
+    while x < max_x:
+        stages(f, x, y, h, tab, k, t, inplace, first_ready)
+        first_ready = False
+        newy = combine(t, h, tab.b, k, y)
+        f1, hit = output(f, x, x+h, h, y, newy, tab, k, t, inplace, sampler, tracker)
+        if hit is not None:
+            x, y = hit
+            if t_eval is None: trajectory.append(x, y)
+            break
+        if f1 is not None: k[0] = f1; first_ready = True
+        if t is not None: t = y       #交换 y 与 t 两个缓冲区
+        y = newy
+        x = x+h
+        if t_eval is None: trajectory.append(x, y)
+        if fsal:
+            k[0] = k[-1]; first_ready = True
+    result = trajectory.result() if t_eval is None else sampler.result()
+    return result if events is None else result+tracker.result()
+
+#定步长方法
+Euler1 = tableau([0], [], [1], order=1)
+Midpoint2 = tableau([0, 1/2], [[1/2]], [0, 1], order=2)
+EulerModified2 = tableau([0, 1], [[1]], [1/2, 1/2], order=2)
+Heun2 = tableau([0, 2/3], [[2/3]], [1/4, 3/4], order=2)
+Kutta3 = tableau([0, 1/2, 1], [[1/2], [-1, 2]], [1/6, 2/3, 1/6], order=3)
+Heun3 = tableau([0, 1/3, 2/3], [[1/3], [0, 2/3]], [1/4, 0, 3/4], order=3)
+Classical4 = tableau([0, 1/2, 1/2, 1], [[1/2], [0, 1/2], [0, 0, 1]], [1/6, 1/3, 1/3, 1/6], order=4)
+
+#嵌入式方法
+RungeKuttaFehlberg45 = tableau(
+    [0, 1/4, 3/8, 12/13, 1, 1/2],
+    [[1/4],
+     [3/32, 9/32],
+     [1932/2197, -7200/2197, 7296/2197],
+     [439/216, -8, 3680/513, -845/4104],
+     [-8/27, 2, -3544/2565, 1859/4104, -11/40]],
+    [25/216, 0, 1408/2565, 2197/4104, -1/5, 0],
+    [16/135, 0, 6656/12825, 28561/56430, -9/50, 2/55],
+    order=4, order_hat=5)
+RKF = RungeKuttaFehlberg45
+
+DormandPrince45 = tableau(
+    [0, 1/5, 3/10, 4/5, 8/9, 1, 1],
+    [[1/5],
+     [3/40, 9/40],
+     [44/45, -56/15, 32/9],
+     [19372/6561, -25360/2187, 64448/6561, -212/729],
+     [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+     [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84]],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0],
+    [5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40],
+    order=5, order_hat=4,
+    dense=[[1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+           [0, 0, 0, 0],
+           [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+           [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+           [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+           [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+           [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]])
+DP = DormandPrince45
+
+BogackiShampine32 = tableau(
+    [0, 1/2, 3/4, 1],
+    [[1/2],
+     [0, 3/4],
+     [2/9, 1/3, 4/9]],
+    [2/9, 1/3, 4/9, 0],
+    [7/24, 1/4, 1/3, 1/8],
+    order=3, order_hat=2)
+BS3 = BogackiShampine32
+
+Tsitouras45 = tableau(
+    [0, 0.161, 0.327, 0.9, 0.9800255409045097, 1, 1],
+    [[0.161],
+     [-0.008480655492356989, 0.335480655492357],
+     [2.897153057105493, -6.359448489975075, 4.3622954328695815],
+     [5.325864828439257, -11.748883564062828, 7.4955393428898365, -0.09249506636175525],
+     [5.86145544294642, -12.92096931784711, 8.159367898576159, -0.071584973281401, -0.028269050394068383],
+     [0.09646076681806523, 0.01, 0.4798896504144996, 1.379008574103742, -3.290069515436081, 2.324710524099774]],
+    [0.09646076681806523, 0.01, 0.4798896504144996, 1.379008574103742, -3.290069515436081, 2.324710524099774, 0],
+    [0.09646076681806523+0.00178001105222577714, 0.01+0.0008164344596567469,
+     0.4798896504144996-0.007880878010261995, 1.379008574103742+0.1447110071732629,
+     -3.290069515436081-0.5823571654525552, 2.324710524099774+0.45808210592918697, -1/66],
+    order=5, order_hat=4)
+Tsit5 = Tsitouras45
+
+Verner65 = tableau(      #Verner 的 6(5) 阶方法（DVERK 所用的系数）
+    [0, 1/6, 4/15, 2/3, 5/6, 1, 1/15, 1],
+    [[1/6],
+     [4/75, 16/75],
+     [5/6, -8/3, 5/2],
+     [-165/64, 55/6, -425/64, 85/96],
+     [12/5, -8, 4015/612, -11/36, 88/255],
+     [-8263/15000, 124/75, -643/680, -81/250, 2484/10625, 0],
+     [3501/1720, -300/43, 297275/52632, -319/2322, 24068/84065, 0, 3850/26703]],
+    [3/40, 0, 875/2244, 23/72, 264/1955, 0, 125/11592, 43/616],
+    [13/160, 0, 2375/5984, 5/16, 12/85, 3/44, 0, 0],
+    order=6, order_hat=5)
+Vern6 = Verner65
+
+if __name__ == "__main__":
+    #y' = y*cos(x), y(0) = 1 的精确解为 exp(sin(x))，h 减半时误差约缩小为 1/2^order
+    f = lambda x, y: y*np.cos(x)
+    for name, tab in [("Classical4", Classical4), ("DP", DP), ("BS3", BS3), ("Tsit5", Tsit5), ("Vern6", Vern6)]:
+        errors = []
+        for h in (0.1, 0.05):
+            x, y = RungeKutta(f, 0, 1, h, 2, tab)
+            errors.append(abs(y[-1]-np.exp(np.sin(x[-1]))))
+        print(f"{name}: {tab.stages} 级，FSAL: {tab.fsal}，估计的阶数 {np.log2(errors[0]/errors[1]):.2f}")
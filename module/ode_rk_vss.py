@@ -2,84 +2,168 @@
 # -*- coding: utf-8 -*-
 from numbers import Number
 from typing import Callable
+import numpy as np
 
 try:
     from .ode__typing import X,Y
+    from .ode__trajectory import Trajectory
+    from .ode_rk_tableau import ButcherTableau, buffers, stages, combine, output
+    from .ode_rk_tableau import RungeKuttaFehlberg45, RKF, DormandPrince45, DP
+    from .ode__dense import Sampler
+    from .ode__event import Event, Tracker
+    from . import ode__inplace
 except:
     from ode__typing import X,Y
+    from ode__trajectory import Trajectory
+    from ode_rk_tableau import ButcherTableau, buffers, stages, combine, output
+    from ode_rk_tableau import RungeKuttaFehlberg45, RKF, DormandPrince45, DP
+    from ode__dense import Sampler
+    from ode__event import Event, Tracker
+    import ode__inplace
 
 #y'=f(x,y)
 
 '''显式变步长 Runge-Kutta 方法
 
-通过一个四阶一个五阶RK方法的结果做差，估计四阶方法的局部误差。
+嵌入式方法用同一组 k 得到两个不同阶数的解，两者之差估计局部误差：
+ err = max(|h*sum(e_i*k_i)| / (max_error + rel_error*max(|y[n]|, |y[n+1]|)))
+err <= 1 则接受这一步，否则拒绝这一步并缩短步长重算（k_1 = f(x[n], y[n]) 与 h 无关，可以直接使用）。
 
-然后令 newh = 0.9*h*(max_error/error)**(1/5) 使局部截断误差在 max_error 范围内。
-依旧具有四阶精度，但总的误差更小。
-'''
+步长在各步之间保持，由 PI 控制器调整（q = min(order, order_hat)+1 为误差估计的阶数）：
+ newh = h * safety * err**(-alpha) * prev_err**beta,  alpha = 0.7/q, beta = 0.4/q
+prev_err 为上一个接受的步的 err。beta = 0 时就是通常的 newh = safety*h*err**(-1/q)（alpha = 1/q）；
+比起只看当前一步的误差，PI 控制器让步长的变化更平稳，拒绝的步更少。
+放大倍数限制在 [min_factor, max_factor] 之内，刚被拒绝之后不再放大步长。
 
-RungeKuttaFehlberg45 = [
-    [
-        [1/4, [1/4]],
-        [3/8, [3/32, 9/32]],
-        [12/13, [1932/2197, -7200/2197, 7296/2197]],
-        [1, [439/216, -8, 3680/513, -845/4104]],
-        [1/2, [-8/27, 2, -3544/2565, 1859/4104, -11/40]]
-    ],
-    [25/216, 0, 1408/2565, 2197/4104, 1/5, 0],
-    [16/135, 0, 6656/12825, 28561/56430, -9/50, 2/55]
-]
-RKF = RungeKuttaFehlberg45
+嵌入式方法的 Butcher 表见 ode_rk_tableau，除 RKF, DP 外还有 BS3, Tsit5, Vern6 等。
 
-DormandPrince45 = [
-    [
-        [1/5, [1/5]],
-        [3/10, [3/40, 9/40]],
-        [4/5, [44/45, -56/15, 32/9]],
-        [8/9, [19372/6561, -25360/2187, 64448/6561, -212/729]],
-        [1, [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]]
-    ],
-    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
-    [5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40] #1/40对应的是 f(x+h, newy) 那项，这里姑且认为不影响，所以不处理。
-]
-DP = DormandPrince45
+给出 t_eval 时，各点处的值由每个接受的步之内的插值得到（见 ode__dense），
+步长只由误差决定，而不必为了落在这些点上而缩短。
+给出 events 时，在每个接受的步之内检测事件 g(x, y) = 0，终止事件发生时停止积分（见 ode__event）。
+'''
 
-def _step(x, y, h, f, max_error, arg):
-    hk = [h*f(x,y),]
-    for i in range(5):
-        newx = x+h*arg[0][i][0]
-        newy = y
-        for j in range(i+1):
-            newy += arg[0][i][1][j]*hk[j]
-        hk.append(h*f(newx,newy))
-    newy = y + sum([arg[1][i]*hk[i] for i in range(6)])
-    newy_r5 = y + sum([arg[2][i]*hk[i] for i in range(6)])
-    error = abs(newy_r5-newy)
-    if error < max_error:
-        return x+h, newy
-    h = 0.9*h/(error/max_error/newy)**(1/5)
-    hk = [h*f(x,y),]
-    for i in range(5):
-        newx = x+h*arg[0][i][0]
-        newy = y
-        for j in range(i+1):
-            newy += arg[0][i][1][j]*hk[j]
-        hk.append(h*f(newx,newy))
-    newy = y + sum([arg[1][i]*hk[i] for i in range(6)])
-    return x+h, newy
+def _error(h, tab, k, y, newy, max_error, rel_error, err, scale) -> float:
+    '''|h*sum(e_i*k_i)|/(max_error+rel_error*max(|y|,|newy|)) 各分量的最大值
+    y 为 np.ndarray 时 err, scale 为与 y 形状相同的缓冲区，y 为数时为 None'''
+    if err is None:
+        return abs(combine(None, h, tab.e, k))/(max_error+rel_error*max(abs(y), abs(newy)))
+    if rel_error:
+        np.abs(y, out=scale); np.abs(newy, out=err)
+        np.maximum(scale, err, out=scale)
+        scale *= rel_error; scale += max_error
+    combine(err, h, tab.e, k)
+    np.abs(err, out=err)
+    err /= scale if rel_error else max_error
+    return float(np.max(err))
 
 def VariableStepSize_RungeKutta(
-    f:Callable[[X, Y], Number], 
+    f:Callable[[X, Y], Y], 
     x_0:X, y_0:Y,
     init_h:Number, max_x:Number,
     max_error:Number,
-    arg=RKF):
-    x=[x_0,]; y=[y_0,]
-    while x[-1] < max_x:
-        newx, newy = _step(x[-1],y[-1],init_h,f,max_error,arg)
-        x.append(newx)
-        y.append(newy)
-    return (x,y)
+    arg:ButcherTableau = RKF,
+    inplace:bool = False,
+    rel_error:Number = 0,
+    safety:Number = 0.9, min_factor:Number = 0.2, max_factor:Number = 5,
+    alpha:Number = None, beta:Number = None,
+    t_eval:np.ndarray = None,
+    events:list[Event|Callable] = None,
+    full_output:bool = False
+    ) -> tuple:
+    '''变步长Runge-Kutta法
+    用于微分方程初值问题 y'=f(x,y); y(x_0)=y_0 的方法
+    从步长 init_h 开始迭代至 x = max_x 为止（最后一步缩短到恰好落在 max_x 上），arg 为使用的嵌入式方法的 Butcher 表
+    每步的局部误差估计不超过 max_error + rel_error*|y|（逐分量），步长的控制见模块说明，alpha, beta 默认为 0.7/q, 0.4/q
+    FSAL 的方法（如 DP）每步的最后一级就是下一步的第一级，不再重复计算
+    步数无法预先确定，轨迹存储在用完时按倍数扩大；步长小到无法推进 x 时抛出 RuntimeError
+    inplace 为 True 时，f 为原地计算的形式 f(x, y, out)，见 ode__inplace
+    给出 t_eval 时返回 t_eval 各点处的 (x, y)，不再保存各步的结果；DP 使用其四阶的连续延拓，其他方法用三次 Hermite 插值
+    给出 events 时检测各事件，额外返回各事件发生处的 x 与 y（每个事件一个 array）；
+    终止事件发生时停止积分，最后一个点为事件发生处，见 ode__event
+    full_output 为 True 时再额外返回接受的步数、拒绝的步数与 f 的计算次数'''
+    q = min(arg.order, arg.order_hat)+1
+    if alpha is None: alpha = 0.7/q
+    if beta is None: beta = 0.4/q
+    sampler = None if t_eval is None else Sampler(t_eval, x_0, max_x, y_0)
+    tracker = None if events is None else Tracker(events, x_0, y_0)
+    if t_eval is None: trajectory = Trajectory([x_0], [y_0])
+    x = x_0; y = ode__inplace.state(y_0)
+    k, t = buffers(y, arg, inplace)
+    if t is None:
+        y = y.item(); err_buf = scale = None
+    else:
+        err_buf = np.empty_like(y); scale = np.empty_like(y)
+    fsal = arg.fsal; first_ready = False
+    h = init_h; prev_err = 1.0; rejected_last = False
+    accepted = rejected = evaluations = 0
+    while x < max_x:
+        h = min(h, max_x-x)
+        if x+h == x:
+            raise RuntimeError(f"步长过小，在 x = {x} 处无法继续")
+        stages(f, x, y, h, arg, k, t, inplace, first_ready)
+        evaluations += arg.stages-first_ready; first_ready = True     #k[0] 与 h 无关，被拒绝时可以直接使用
+        newy = combine(t, h, arg.b, k, y)
+        err = _error(h, arg, k, y, newy, max_error, rel_error, err_buf, scale)
+        if err <= 1:
+            factor = max_factor if err == 0 else safety*err**(-alpha)*prev_err**beta
+            factor = min(max_factor, max(min_factor, factor))
+            if rejected_last: factor = min(factor, 1)
+            newx = x+h if h < max_x-x else max_x
+            first_ready = False
+            f1, hit = output(f, x, newx, h, y, newy, arg, k, t, inplace, sampler, tracker)
+            if f1 is not None and not fsal:
+                k[0] = f1; first_ready = True; evaluations += 1
+            accepted += 1
+            if hit is not None:
+                x, y = hit
+                if t_eval is None: trajectory.append(x, y)
+                break
+            x = newx
+            if t is not None: t = y
+            y = newy
+            if t_eval is None: trajectory.append(x, y)
+            prev_err = max(err, 1e-4); rejected_last = False
+            if fsal: k[0] = k[-1]; first_ready = True
+        else:
+            factor = safety*err**(-1/q) if np.isfinite(err) else min_factor
+            factor = min(1, max(min_factor, factor))
+            rejected += 1; rejected_last = True
+        h = h*factor
+    result = trajectory.result() if t_eval is None else sampler.result()
+    if events is not None: result = result+tracker.result()
+    return result+(accepted, rejected, evaluations) if full_output else result
 
 if __name__ == "__main__":
-    pass    #预留，不做任何处理
\ No newline at end of file
+    try: from .ode_rk_tableau import BS3, Tsit5, Vern6
+    except: from ode_rk_tableau import BS3, Tsit5, Vern6
+
+    #work-precision：y' = y*cos(x), y(0) = 1 在 [0, 20] 上，精确解为 exp(sin(x))
+    #同样的最大误差下，f 的计算次数越少越好
+    f = lambda x, y: y*np.cos(x)
+    print("方法    容许误差   f的计算次数  接受  拒绝  最大误差")
+    for name, tab in [("BS3", BS3), ("RKF", RKF), ("DP", DP), ("Tsit5", Tsit5), ("Vern6", Vern6)]:
+        for tol in (1e-4, 1e-6, 1e-8, 1e-10):
+            x, y, accepted, rejected, evaluations = VariableStepSize_RungeKutta(
+                f, 0, 1, 0.1, 20, tol, tab, rel_error=tol, full_output=True)
+            print(f"{name:6}  {tol:8.0e}  {evaluations:10}  {accepted:5} {rejected:5}  {np.max(np.abs(y-np.exp(np.sin(x)))):.2e}")
+
+    #PI 控制器与只看当前误差的控制器（beta = 0）比较
+    for beta in (None, 0):
+        x, y, accepted, rejected, evaluations = VariableStepSize_RungeKutta(
+            f, 0, 1, 0.1, 20, 1e-8, DP, rel_error=1e-8, alpha=None if beta is None else 1/5, beta=beta, full_output=True)
+        print(f"{'PI' if beta is None else 'I'} 控制器：接受 {accepted} 步，拒绝 {rejected} 步，f 的计算次数 {evaluations}")
+
+    #稠密输出：取值点的多少不影响步数
+    for n in (11, 10001):
+        t_eval = np.linspace(0, 20, n)
+        x, y, accepted, rejected, evaluations = VariableStepSize_RungeKutta(
+            f, 0, 1, 0.1, 20, 1e-8, DP, rel_error=1e-8, t_eval=t_eval, full_output=True)
+        print(f"DP，{n} 个取值点：f 的计算次数 {evaluations}，最大误差 {np.max(np.abs(y-np.exp(np.sin(x)))):.2e}")
+
+    #事件：从 10 米高处自由落体，落地（y[0] 由正变负）时停止，精确的落地时间为 sqrt(20/9.81)
+    fall = lambda x, y: np.array([y[1], -9.81])
+    ground = Event(lambda x, y: y[0], terminal=True, direction=-1)
+    x, y, x_events, y_events, accepted, rejected, evaluations = VariableStepSize_RungeKutta(
+        fall, 0, np.array([10., 0]), 0.1, 100, 1e-8, DP, events=[ground], full_output=True)
+    print(f"落地时间 {x_events[0][0]:.12f}（误差 {x_events[0][0]-np.sqrt(20/9.81):.1e}），速度 {y_events[0][0][1]:.6f}，"
+          f"f 的计算次数 {evaluations}")